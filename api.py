@@ -0,0 +1,380 @@
+# api.py
+"""
+Локальный read-only JSON API для киосков и родительской страницы.
+
+Запуск рядом с приложением:  python api.py  (адрес — API_HOST:API_PORT из settings.py)
+
+Все ответы считаются заранее, один раз на снимок расписания (+ замены текущей недели),
+и хранятся готовыми байтами: обычными и gzip. ETag строгий и привязан к отпечатку снимка,
+поэтому повторный запрос с If-None-Match получает 304 без тела.
+
+Маршруты (имена и дни — в URL-кодировке, регистр не важен, день: "Среда" или "СР"):
+  /api/snapshot                     — отпечаток, время загрузки, списки классов/педагогов/кабинетов
+  /api/class/<класс>[/<день>]
+  /api/teacher/<педагог или тьютор>[/<день>]
+  /api/room/<кабинет>[/<день>]
+  /api/day/<день>
+  /api/conflicts
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+import time as _time
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+from settings import (
+    API_HOST, API_PORT, LOCAL_WATCH, LOCAL_WATCH_DEBOUNCE_SECONDS,
+    LOCAL_WATCH_POLL_SECONDS, OVERLAY_REFRESH_SECONDS, REFRESH_EVERY_SECONDS, SOURCES, TIMEZONE, WEEKDAY_MAP,
+)
+from conflicts import _canonical, _norm_key, detect_conflicts
+from names import analyze_names
+from overlay import OverlayChange, apply_overlay, parse_overlay, week_start_of
+from source import configured_sources, has_overlay_source, load_overlay_table, overlay_local_mtime
+from transform import process_raw_table, process_sources, snapshot_fingerprint
+from watch import FileWatcher
+
+# "ПНД" / "понедельник" -> "Понедельник"
+DAY_ALIASES = {
+    **{_norm_key(abbr): full for abbr, full in WEEKDAY_MAP.items()},
+    **{_norm_key(full): full for full in WEEKDAY_MAP.values()},
+}
+
+LESSON_FIELDS = {
+    "День недели": "day",
+    "Номер урока": "num",
+    "Начало": "start",
+    "Конец": "end",
+    "Кампус": "campus",
+    "Класс": "class",
+    "Группа": "group",
+    "Предмет": "subject",
+    "Педагог": "teacher",
+    "Тьютор": "tutor",
+    "Комната": "room",
+    "Изменение": "change",
+}
+
+CONFLICT_FIELDS = {
+    "Тип": "type",
+    "Ресурс": "resource",
+    "День недели": "day",
+    "Пересечение (мин)": "overlap_min",
+    "Урок 1": "lesson_1",
+    "Урок 2": "lesson_2",
+}
+
+
+@dataclass(frozen=True)
+class _Response:
+    body: bytes
+    gz: bytes
+    etag: str
+
+
+def _json_value(v: Any) -> Any:
+    if isinstance(v, time):
+        return v.strftime("%H:%M")
+    if v is None or (isinstance(v, float) and pd.isna(v)) or v is pd.NA:
+        return None
+    if hasattr(v, "item"):  # numpy-числа
+        return v.item()
+    return v
+
+
+def _lessons(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    cols = [c for c in LESSON_FIELDS if c in df.columns]
+    return [
+        {LESSON_FIELDS[c]: _json_value(v) for c, v in zip(cols, row)}
+        for row in df[cols].itertuples(index=False, name=None)
+    ]
+
+
+def _response(payload: Any, fingerprint: str) -> _Response:
+    body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    # строгий ETag: отпечаток снимка + хеш тела (у каждого представления — свой)
+    etag = f"{fingerprint}-{hashlib.sha1(body).hexdigest()[:12]}"
+    return _Response(body=body, gz=gzip.compress(body, compresslevel=6, mtime=0), etag=etag)
+
+
+def build_responses(
+    df: pd.DataFrame,
+    conflicts_df: pd.DataFrame,
+    fingerprint: str,
+    loaded_at: str,
+    aliases: Optional[Dict[str, str]] = None,
+) -> Dict[str, _Response]:
+    """
+    Все ответы API для снимка: путь (нормализованный) -> готовые байты.
+    Педагоги и кабинеты сгруппированы по каноническому имени (aliases), как и в конфликтах;
+    варианты написания ведут на тот же ответ.
+    """
+    out: Dict[str, _Response] = {}
+    day_col = df["День недели"] if not df.empty else pd.Series(dtype=object)
+    days = [d for d in WEEKDAY_MAP.values() if (day_col == d).any()]
+    variants: Dict[str, List[str]] = {}  # ключ канонического имени -> ключи вариантов
+    for variant, canonical in (aliases or {}).items():
+        variants.setdefault(_norm_key(canonical), []).append(variant)
+
+    def add_entity(kind: str, name: str, mask: pd.Series) -> None:
+        part = df[mask]
+        keys = [_norm_key(name)] + (variants.get(_norm_key(name), []) if kind != "class" else [])
+        resp = _response({"fingerprint": fingerprint, kind: name, "lessons": _lessons(part)}, fingerprint)
+        day_resps = {
+            day: _response(
+                {"fingerprint": fingerprint, kind: name, "day": day,
+                 "lessons": _lessons(part[part["День недели"] == day])},
+                fingerprint,
+            )
+            for day in days
+        }
+        for key in keys:
+            out[f"/api/{kind}/{key}"] = resp
+            for day, day_resp in day_resps.items():
+                out[f"/api/{kind}/{key}/{_norm_key(day)}"] = day_resp
+
+    index: Dict[str, List[str]] = {"classes": [], "teachers": [], "rooms": []}
+    if not df.empty:
+        def canonical_keys(col: str) -> pd.Series:
+            return df[col].astype(str).map(lambda v: _norm_key(_canonical(v.strip(), aliases)))
+
+        norm = {"Класс": df["Класс"].astype(str).map(_norm_key)}
+        norm.update({c: canonical_keys(c) for c in ("Педагог", "Тьютор", "Комната")})
+
+        for name in sorted(set(df["Класс"].astype(str)) - {""}):
+            index["classes"].append(name)
+            add_entity("class", name, norm["Класс"] == _norm_key(name))
+
+        people = {
+            _norm_key(_canonical(p.strip(), aliases)): _canonical(p.strip(), aliases)
+            for col in ("Педагог", "Тьютор") for p in df[col].astype(str) if p.strip()
+        }
+        for key, name in sorted(people.items()):
+            index["teachers"].append(name)
+            add_entity("teacher", name, (norm["Педагог"] == key) | (norm["Тьютор"] == key))
+
+        rooms = {
+            _norm_key(_canonical(r.strip(), aliases)): _canonical(r.strip(), aliases)
+            for r in df["Комната"].astype(str) if r.strip()
+        }
+        for key, name in sorted(rooms.items()):
+            index["rooms"].append(name)
+            add_entity("room", name, norm["Комната"] == key)
+
+        for day in days:
+            out[f"/api/day/{_norm_key(day)}"] = _response(
+                {"fingerprint": fingerprint, "day": day, "lessons": _lessons(df[day_col == day])}, fingerprint
+            )
+
+    conflicts = []
+    if conflicts_df is not None and not conflicts_df.empty:
+        visible = [c for c in CONFLICT_FIELDS if c in conflicts_df.columns]
+        conflicts = [
+            {CONFLICT_FIELDS[c]: _json_value(v) for c, v in zip(visible, row)}
+            for row in conflicts_df[visible].itertuples(index=False, name=None)
+        ]
+    out["/api/conflicts"] = _response({"fingerprint": fingerprint, "conflicts": conflicts}, fingerprint)
+
+    out["/api/snapshot"] = _response(
+        {"fingerprint": fingerprint, "loaded_at": loaded_at, "days": days, **index}, fingerprint
+    )
+    return out
+
+
+@dataclass(frozen=True)
+class _Base:
+    """Обработанная таблица(ы) без замен + псевдонимы имен."""
+    df: pd.DataFrame
+    meta: Dict[str, Any]
+    aliases: Dict[str, str]
+
+
+def load_base() -> _Base:
+    # Функции вызываются напрямую, без кэшей Streamlit
+    df, meta = process_sources() if SOURCES else process_raw_table()
+    _, aliases = analyze_names(df)
+    return _Base(df=df, meta=meta, aliases=aliases)
+
+
+def load_changes(base: _Base) -> Tuple[List[OverlayChange], str]:
+    """Замены и их отпечаток. Ошибка чтения файла замен не мешает отдавать базовое расписание."""
+    if not has_overlay_source():
+        return [], "none"
+    try:
+        changes, _ = parse_overlay(load_overlay_table(), base.meta.get("class_levels"))
+    except Exception as e:
+        print(f"{datetime.now():%H:%M:%S} замены не загружены: {e}")
+        return [], "error"
+    return changes, hashlib.sha1(repr(changes).encode("utf-8")).hexdigest()[:16]
+
+
+def current_week() -> date:
+    return week_start_of(datetime.now(ZoneInfo(TIMEZONE)).date())
+
+
+def build_snapshot(base: _Base, changes: List[OverlayChange], week_start: date) -> Tuple[Dict[str, _Response], str]:
+    """Тот же конвейер, что и в app.py: таблица(ы) -> замены недели week_start -> конфликты."""
+    df = base.df
+    if changes and not df.empty:
+        df, _, _ = apply_overlay(df, changes, week_start, base.aliases, base.meta.get("class_levels"))
+
+    conflicts_df, _ = detect_conflicts(df, base.aliases) if not df.empty else (pd.DataFrame(), {})
+    fingerprint = snapshot_fingerprint(df)
+    return build_responses(df, conflicts_df, fingerprint, base.meta["last_loaded_at"], base.aliases), fingerprint
+
+
+def load_snapshot() -> Tuple[Dict[str, _Response], str]:
+    base = load_base()
+    changes, _ = load_changes(base)
+    return build_snapshot(base, changes, current_week())
+
+
+class _State:
+    """Текущий набор ответов; подменяется целиком, поэтому читателям не нужна блокировка."""
+    responses: Dict[str, _Response] = {}
+    fingerprint: str = ""
+
+
+def _normalize_path(path: str) -> str:
+    # сначала делим, потом декодируем: "/" внутри имени приходит как %2F
+    parts = [_norm_key(unquote(p)) for p in urlsplit(path).path.split("/") if p]
+    if parts and parts[-1] in DAY_ALIASES and len(parts) >= 3:
+        parts[-1] = _norm_key(DAY_ALIASES[parts[-1]])
+    return "/" + "/".join(parts)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive: киоски и нагрузочный тест не открывают соединение на каждый запрос
+    server_version = "ScheduleAPI"
+    # заголовки и тело уходят разными write(): без TCP_NODELAY каждый ответ ждет delayed ACK (~40 мс)
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send(self, head_only: bool) -> None:
+        resp = _State.responses.get(_normalize_path(self.path))
+        if resp is None:
+            body = b'{"error":"not found"}'
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if not head_only:
+                self.wfile.write(body)
+            return
+
+        use_gzip = "gzip" in self.headers.get("Accept-Encoding", "")
+        etag = f'"{resp.etag}-gz"' if use_gzip else f'"{resp.etag}"'
+        inm = self.headers.get("If-None-Match")
+        if inm and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            self.end_headers()
+            return
+
+        body = resp.gz if use_gzip else resp.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self._send(head_only=False)
+
+    def do_HEAD(self) -> None:
+        self._send(head_only=True)
+
+
+def _base_key(watchers: List[FileWatcher], has_remote: bool) -> Tuple[int, ...]:
+    # номера изменений локальных файлов (watch.FileWatcher) + номер интервала REFRESH_EVERY_SECONDS для ссылок
+    ttl_slot = int(_time.time() // REFRESH_EVERY_SECONDS) if has_remote or not watchers else 0
+    return tuple(w.version for w in watchers) + (ttl_slot,)
+
+
+def _overlay_key() -> Any:
+    # mtime локального файла замен или номер интервала OVERLAY_REFRESH_SECONDS для ссылки
+    if not has_overlay_source():
+        return None
+    try:
+        mtime = overlay_local_mtime()
+    except FileNotFoundError:
+        return "missing"
+    return mtime if mtime is not None else int(_time.time() // OVERLAY_REFRESH_SECONDS)
+
+
+def _refresh_loop(
+    watchers: List[FileWatcher],
+    has_remote: bool,
+    base: _Base,
+    changes: List[OverlayChange],
+    overlay_fp: str,
+) -> None:
+    # Перечитываем таблицу — при изменении файла (или по таймеру), замены — при изменении файла замен
+    # (или раз в OVERLAY_REFRESH_SECONDS); ответы пересобираем, если поменялись таблица, замены или неделя.
+    # Ошибки не роняют сервер — продолжаем отдавать последний удачный снимок.
+    base_key, overlay_key = _base_key(watchers, has_remote), _overlay_key()
+    built = (base.meta["fingerprint"], overlay_fp, current_week())
+    while True:
+        _time.sleep(2.0)
+        try:
+            if _base_key(watchers, has_remote) != base_key:
+                base_key = _base_key(watchers, has_remote)
+                known_classes = base.meta.get("class_levels")
+                base = load_base()
+                if base.meta.get("class_levels") != known_classes:
+                    overlay_key = None  # набор классов поменялся — замены разбираем заново
+            if _overlay_key() != overlay_key:
+                overlay_key = _overlay_key()
+                changes, overlay_fp = load_changes(base)
+            week = current_week()
+            if (base.meta["fingerprint"], overlay_fp, week) == built:
+                continue
+            _State.responses, _State.fingerprint = build_snapshot(base, changes, week)
+            built = (base.meta["fingerprint"], overlay_fp, week)
+            print(f"{datetime.now():%H:%M:%S} снимок обновлен: {_State.fingerprint}")
+        except Exception as e:
+            print(f"{datetime.now():%H:%M:%S} ошибка обновления: {e}")
+
+
+def main() -> None:
+    base = load_base()
+    changes, overlay_fp = load_changes(base)
+    _State.responses, _State.fingerprint = build_snapshot(base, changes, current_week())
+    specs = configured_sources()
+    watchers = [
+        FileWatcher(spec.location, LOCAL_WATCH_DEBOUNCE_SECONDS, LOCAL_WATCH_POLL_SECONDS).start()
+        for spec in specs if LOCAL_WATCH and spec.mode == "excel_local"
+    ]
+    has_remote = any(spec.mode != "excel_local" for spec in specs)
+    threading.Thread(
+        target=_refresh_loop, args=(watchers, has_remote, base, changes, overlay_fp), name="api-refresh", daemon=True
+    ).start()
+
+    server = ThreadingHTTPServer((API_HOST, API_PORT), ApiHandler)
+    server.daemon_threads = True
+    print(f"API: http://{API_HOST}:{API_PORT}/api/snapshot  (ответов: {len(_State.responses)}, снимок {_State.fingerprint})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# api_loadtest.py
+"""
+Нагрузочный тест локального API (api.py должен быть запущен).
+
+    python api_loadtest.py --seconds 10 --connections 8
+
+Каждый поток держит одно keep-alive соединение и запрашивает случайные страницы классов/педагогов/
+кабинетов/дней. Часть запросов идет с If-None-Match (как у киоска, который уже получил ответ) —
+доля задается --revalidate.
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from typing import List
+from urllib.parse import quote
+
+from settings import API_HOST, API_PORT
+
+
+def _paths(host: str, port: int) -> List[str]:
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    conn.request("GET", "/api/snapshot")
+    snap = json.loads(conn.getresponse().read())
+    conn.close()
+
+    paths = ["/api/conflicts", "/api/snapshot"]
+    for kind, names in (("class", snap["classes"]), ("teacher", snap["teachers"]), ("room", snap["rooms"])):
+        for name in names:
+            paths.append(f"/api/{kind}/{quote(name)}")
+            paths += [f"/api/{kind}/{quote(name)}/{quote(day)}" for day in snap["days"]]
+    paths += [f"/api/day/{quote(day)}" for day in snap["days"]]
+    return paths
+
+
+def _worker(host: str, port: int, paths: List[str], deadline: float, revalidate: float,
+            latencies: List[float], statuses: dict, lock: threading.Lock) -> None:
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    etags = {}
+    local_lat, local_status = [], {}
+    while time.perf_counter() < deadline:
+        path = random.choice(paths)
+        headers = {"Accept-Encoding": "gzip"}
+        if path in etags and random.random() < revalidate:
+            headers["If-None-Match"] = etags[path]
+        t0 = time.perf_counter()
+        conn.request("GET", path, headers=headers)
+        resp = conn.getresponse()
+        resp.read()
+        local_lat.append(time.perf_counter() - t0)
+        local_status[resp.status] = local_status.get(resp.status, 0) + 1
+        if resp.getheader("ETag"):
+            etags[path] = resp.getheader("ETag")
+    conn.close()
+    with lock:
+        latencies += local_lat
+        for k, v in local_status.items():
+            statuses[k] = statuses.get(k, 0) + v
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default=API_HOST)
+    ap.add_argument("--port", type=int, default=API_PORT)
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--connections", type=int, default=8)
+    ap.add_argument("--revalidate", type=float, default=0.8, help="доля запросов с If-None-Match")
+    args = ap.parse_args()
+
+    paths = _paths(args.host, args.port)
+    latencies: List[float] = []
+    statuses: dict = {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.seconds
+    threads = [
+        threading.Thread(target=_worker, args=(args.host, args.port, paths, deadline, args.revalidate,
+                                               latencies, statuses, lock))
+        for _ in range(args.connections)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    n = len(latencies)
+    pct = lambda p: latencies[min(n - 1, int(n * p))] * 1000 if n else 0.0
+    print(f"маршрутов: {len(paths)}, запросов: {n}, {n / args.seconds:.0f} запр/с")
+    print(f"статусы: {dict(sorted(statuses.items()))}")
+    print(f"задержка, мс: p50={pct(0.50):.2f} p95={pct(0.95):.2f} p99={pct(0.99):.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,12 @@
 import streamlit as st
 
 from settings import DATA_MODE
-from transform import load_and_process_data
-from conflicts import detect_conflicts
+from transform import load_and_process_data, local_source_watchers
+from overlay import get_schedule_view
+from history import get_history, record_snapshot
+from names import get_name_quality
+from intervals import get_interval_index
+from availability import get_availability
 from ui import (
     render_tab_selector_and_refresh,
     render_filters,                # фильтры расписания (sidebar)
@@ -12,6 +16,11 @@ from ui import (
     render_diagnostics,
     render_footer,
     render_conflicts_tab,
+    render_now_tab,
+    render_free_tab,
+    render_overlay_week_selector,
+    render_history_tab,
+    render_local_watch,
 )
 
 st.set_page_config(page_title="Школьное расписание", page_icon="📚", layout="wide")
@@ -21,6 +30,11 @@ st.markdown("---")
 # Вкладки + кнопка обновления (кнопка теперь просто чистит cache_data)
 active_tab = render_tab_selector_and_refresh()
 
+# Локальные файлы: перезагрузка по факту сохранения, а не по таймеру
+watchers = local_source_watchers()
+if watchers:
+    render_local_watch(watchers)
+
 # ===== загрузка данных (ОДИН РАЗ) =====
 try:
     df, meta = load_and_process_data()
@@ -36,8 +50,20 @@ if df.empty:
     )
     st.stop()
 
-# ===== конфликты =====
-conflicts_df, conflicts_meta = detect_conflicts(df)
+# ===== история версий (запись один раз на новый отпечаток) =====
+try:
+    record_snapshot(df, meta["fingerprint"])
+except Exception as e:
+    meta["warnings"].append(f"Не удалось сохранить версию в историю: {e}")
+
+# ===== качество имен (похожие написания одного человека/кабинета) =====
+meta["name_duplicates"], name_aliases = get_name_quality(df, meta["fingerprint"])
+
+# ===== замены недели + конфликты (по базе — один раз на снимок, дальше только затронутые ресурсы) =====
+week_start = render_overlay_week_selector()
+df, conflicts_df, conflicts_meta, meta["overlay"], view_fingerprint = get_schedule_view(
+    df, meta["fingerprint"], week_start, meta.get("class_levels")
+)
 
 # ===== рендер активной вкладки =====
 if active_tab == "📅 Расписание":
@@ -45,6 +71,12 @@ if active_tab == "📅 Расписание":
     render_table(filtered_schedule_df)
     render_diagnostics(meta)
     render_footer()
+elif active_tab == "🕒 Сейчас":
+    render_now_tab(get_interval_index(df, view_fingerprint))
+elif active_tab == "🆓 Свободные":
+    render_free_tab(get_availability(df, view_fingerprint, name_aliases))
+elif active_tab == "🕘 История":
+    render_history_tab(get_history())
 else:
     filtered_conflicts_df, _ = render_conflicts_filters(conflicts_df)
     render_conflicts_tab(filtered_conflicts_df, conflicts_meta)
@@ -0,0 +1,156 @@
+# availability.py
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import time
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from conflicts import build_events, _canonical, _norm_key, _time_to_min
+
+# Сетка занятости: сутки, разбитые на тики по 5 минут
+TICK_MINUTES = 5
+TICKS_PER_DAY = 24 * 60 // TICK_MINUTES
+BYTES_PER_DAY = (TICKS_PER_DAY + 7) // 8
+
+
+def _tick_range(start_min: int, end_min: int) -> Tuple[int, int]:
+    # Тик занят, если интервал задевает его хоть на минуту (границы [start, end) )
+    first = start_min // TICK_MINUTES
+    last = -(-end_min // TICK_MINUTES)  # ceil
+    return max(0, first), min(TICKS_PER_DAY, last)
+
+
+def window_mask(start_min: int, end_min: int) -> np.ndarray:
+    """Упакованная битовая маска окна [start_min, end_min) для одного дня."""
+    bits = np.zeros(TICKS_PER_DAY, dtype=bool)
+    first, last = _tick_range(start_min, end_min)
+    bits[first:last] = True
+    return np.packbits(bits)
+
+
+@dataclass
+class _Resources:
+    """Ресурсы одного типа и их занятость: busy[ресурс, день, байт]."""
+    keys: List[str] = field(default_factory=list)
+    labels: List[str] = field(default_factory=list)
+    busy: np.ndarray = field(default_factory=lambda: np.zeros((0, 0, BYTES_PER_DAY), dtype=np.uint8))
+
+
+@dataclass
+class AvailabilityMatrix:
+    """
+    Предрасчитанная занятость педагогов/тьюторов ("person") и кабинетов ("room")
+    по дням с шагом TICK_MINUTES. Поиск свободных на окно — одна операция AND
+    по всей матрице ресурса.
+    """
+    days: List[str] = field(default_factory=list)
+    resources: Dict[str, _Resources] = field(default_factory=dict)
+    # предметы, которые ведет педагог (по нормализованному ключу)
+    subjects_by_person: Dict[str, Set[str]] = field(default_factory=dict)
+    # уникальные уроки-слоты каждого дня: (номер, начало, конец)
+    slots: Dict[str, List[Tuple[Any, time, time]]] = field(default_factory=dict)
+
+    def all_subjects(self) -> List[str]:
+        out: Set[str] = set()
+        for s in self.subjects_by_person.values():
+            out |= s
+        return sorted(out, key=str.casefold)
+
+    def free(
+        self,
+        resource_type: str,
+        day: str,
+        start: time,
+        end: time,
+        subjects: Optional[List[str]] = None,
+    ) -> List[str]:
+        """
+        Свободные ресурсы на окно [start, end) дня day.
+        subjects — только педагоги, ведущие хотя бы один из этих предметов.
+        Ресурсы, у которых в этот день нет уроков вовсе, тоже считаются свободными.
+        """
+        res = self.resources.get(resource_type)
+        if res is None or not res.keys:
+            return []
+
+        mask = window_mask(_time_to_min(start), _time_to_min(end))
+        if day in self.days:
+            row = res.busy[:, self.days.index(day), :]
+            free_mask = ~np.any(row & mask, axis=1)
+        else:
+            free_mask = np.ones(len(res.keys), dtype=bool)
+
+        out = []
+        wanted = {s.casefold() for s in subjects} if subjects else None
+        for i in np.flatnonzero(free_mask):
+            if wanted is not None:
+                taught = {s.casefold() for s in self.subjects_by_person.get(res.keys[i], ())}
+                if not (taught & wanted):
+                    continue
+            out.append(res.labels[i])
+        return sorted(out, key=str.casefold)
+
+
+def build_availability(
+    df: pd.DataFrame,
+    aliases: Optional[Dict[str, str]] = None,
+) -> Tuple[AvailabilityMatrix, Dict[str, Any]]:
+    """
+    Строит AvailabilityMatrix из тех же событий, что и detect_conflicts (build_events).
+    Возвращает матрицу и meta из build_events.
+    """
+    events, meta = build_events(df, aliases)
+    matrix = AvailabilityMatrix()
+
+    day_order = {"Понедельник": 1, "Вторник": 2, "Среда": 3, "Четверг": 4, "Пятница": 5}
+    matrix.days = sorted({ev.day for ev in events}, key=lambda d: day_order.get(d, 99))
+    day_pos = {d: i for i, d in enumerate(matrix.days)}
+
+    # Собираем ресурсы и тики (сначала в распакованном виде — так проще ставить диапазоны)
+    grids: Dict[str, Tuple[Dict[str, int], List[str], List[np.ndarray]]] = {}
+    for ev in events:
+        keys_pos, labels, rows = grids.setdefault(ev.resource_type, ({}, [], []))
+        pos = keys_pos.get(ev.resource_key)
+        if pos is None:
+            pos = keys_pos[ev.resource_key] = len(labels)
+            labels.append(ev.resource_label)
+            rows.append(np.zeros((len(matrix.days), TICKS_PER_DAY), dtype=bool))
+        first, last = _tick_range(ev.start_min, ev.end_min)
+        rows[pos][day_pos[ev.day], first:last] = True
+
+        teacher = ev.lesson["Педагог"]
+        if ev.resource_type == "person" and teacher and ev.resource_key == _norm_key(_canonical(teacher, aliases)):
+            matrix.subjects_by_person.setdefault(ev.resource_key, set()).add(ev.lesson["Предмет"])
+
+    for rtype, (keys_pos, labels, rows) in grids.items():
+        res = _Resources(keys=list(keys_pos.keys()), labels=labels)
+        res.busy = np.packbits(np.stack(rows), axis=2) if rows else res.busy
+        matrix.resources[rtype] = res
+
+    if "Номер урока" in df.columns:
+        seen = set()
+        for r in df[["День недели", "Номер урока", "Начало", "Конец"]].itertuples(index=False):
+            day, num, start, end = r
+            if not isinstance(start, time) or not isinstance(end, time) or (day, start, end) in seen:
+                continue
+            seen.add((day, start, end))
+            matrix.slots.setdefault(day, []).append((num, start, end))
+        for day_slots in matrix.slots.values():
+            day_slots.sort(key=lambda x: (x[1], x[2]))
+
+    return matrix, meta
+
+
+@st.cache_resource(max_entries=4)
+def get_availability(
+    _df: pd.DataFrame,
+    fingerprint: str,
+    _aliases: Optional[Dict[str, str]] = None,
+) -> AvailabilityMatrix:
+    # df не хешируем (дорого) — ключ кэша задает отпечаток снимка
+    matrix, _ = build_availability(_df, _aliases)
+    return matrix
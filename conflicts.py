@@ -3,7 +3,7 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import time
-from typing import Dict, Any, List, Tuple, Optional
+from typing import Dict, Any, List, Tuple, Optional, Set
 import pandas as pd
 
 
@@ -12,6 +12,13 @@ def _norm_key(s: str) -> str:
     return " ".join(str(s).strip().split()).casefold()
 
 
+def _canonical(label: str, aliases: Optional[Dict[str, str]]) -> str:
+    # Псевдонимы (см. names.analyze_names): "Иванова А.А." -> "Иванова А." и т.п.
+    if not aliases:
+        return label
+    return aliases.get(_norm_key(label), label)
+
+
 def _time_to_min(t: time) -> int:
     return t.hour * 60 + t.minute
 
@@ -52,11 +59,16 @@ class _Event:
     lesson: Dict[str, Any]    # данные строки расписания (для вывода)
 
 
-def build_events(df: pd.DataFrame) -> Tuple[List[_Event], Dict[str, Any]]:
+def build_events(
+    df: pd.DataFrame,
+    aliases: Optional[Dict[str, str]] = None,
+) -> Tuple[List[_Event], Dict[str, Any]]:
     """
     Превращаем расписание в список "событий" для проверки конфликтов.
     Для людей: берём и Педагога, и Тьютора (оба считаются одним типом ресурса: person).
     Для кабинетов: берём Комнату.
+    aliases: нормализованный ключ варианта имени -> каноническое имя; варианты
+    одного человека/кабинета попадают в один ресурс.
     """
     meta = {
         "skipped_no_time": 0,
@@ -109,9 +121,11 @@ def build_events(df: pd.DataFrame) -> Tuple[List[_Event], Dict[str, Any]]:
         # --- Люди (педагог + тьютор)
         people = []
         if row_dict["Педагог"] != "":
-            people.append(row_dict["Педагог"])
-        if row_dict["Тьютор"] != "" and row_dict["Тьютор"] != row_dict["Педагог"]:
-            people.append(row_dict["Тьютор"])
+            people.append(_canonical(row_dict["Педагог"], aliases))
+        if row_dict["Тьютор"] != "":
+            tutor = _canonical(row_dict["Тьютор"], aliases)
+            if not people or _norm_key(tutor) != _norm_key(people[0]):
+                people.append(tutor)
 
         if not people:
             meta["skipped_no_person"] += 1
@@ -133,7 +147,7 @@ def build_events(df: pd.DataFrame) -> Tuple[List[_Event], Dict[str, Any]]:
                 meta["events_person"] += 1
 
         # --- Кабинеты
-        room = row_dict["Комната"]
+        room = _canonical(row_dict["Комната"], aliases)
         if room == "":
             meta["skipped_no_room"] += 1
         else:
@@ -155,61 +169,147 @@ def build_events(df: pd.DataFrame) -> Tuple[List[_Event], Dict[str, Any]]:
     return events, meta
 
 
-def detect_conflicts(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, Any]]:
-    """
-    Возвращает:
-      - conflicts_df: строки конфликтов
-      - meta: статистика (сколько событий, сколько пропусков, и т.п.)
-    """
-    events, meta = build_events(df)
-    if not events:
-        meta["conflicts_found"] = 0
-        return pd.DataFrame(), meta
+def _scan_bucket(rtype: str, day: str, rkey: str, evs: List[_Event]) -> List[Dict[str, Any]]:
+    """Ищет пересечения внутри одной корзины (тип ресурса, день, ресурс)."""
+    rows: List[Dict[str, Any]] = []
 
+    # сортируем по началу
+    evs_sorted = sorted(evs, key=lambda e: e.start_min)
+
+    active: List[_Event] = []  # события, которые еще не закончились
+    for cur in evs_sorted:
+        # выкидываем завершившиеся к моменту начала текущего
+        active = [a for a in active if a.end_min > cur.start_min]
+
+        # проверяем пересечения с активными
+        for a in active:
+            ov = _overlap_minutes(a.start_min, a.end_min, cur.start_min, cur.end_min)
+            if ov > 0:
+                rows.append({
+                    "Тип": "Преподаватель/тьютор" if rtype == "person" else "Кабинет",
+                    "Ресурс": cur.resource_label if rtype != "person" else (cur.resource_label or a.resource_label),
+                    "День недели": day,
+                    "Пересечение (мин)": ov,
+                    "Урок 1": _lesson_brief(a.lesson),
+                    "Урок 2": _lesson_brief(cur.lesson),
+                    "__sort_rtype": 0 if rtype == "person" else 1,
+                    "__sort_key": rkey,
+                })
+
+        active.append(cur)
+
+    return rows
+
+
+def _bucket_events(events: List[_Event]) -> Dict[Tuple[str, str, str], List[_Event]]:
     # Группируем по (тип ресурса, день, ресурс)
     buckets: Dict[Tuple[str, str, str], List[_Event]] = {}
     for ev in events:
         key = (ev.resource_type, ev.day, ev.resource_key)
         buckets.setdefault(key, []).append(ev)
+    return buckets
 
-    conflicts_rows: List[Dict[str, Any]] = []
-
-    for (rtype, day, rkey), evs in buckets.items():
-        # сортируем по началу
-        evs_sorted = sorted(evs, key=lambda e: e.start_min)
-
-        active: List[_Event] = []  # события, которые еще не закончились
-        for cur in evs_sorted:
-            # выкидываем завершившиеся к моменту начала текущего
-            active = [a for a in active if a.end_min > cur.start_min]
-
-            # проверяем пересечения с активными
-            for a in active:
-                ov = _overlap_minutes(a.start_min, a.end_min, cur.start_min, cur.end_min)
-                if ov > 0:
-                    conflicts_rows.append({
-                        "Тип": "Преподаватель/тьютор" if rtype == "person" else "Кабинет",
-                        "Ресурс": cur.resource_label if rtype != "person" else (cur.resource_label or a.resource_label),
-                        "День недели": day,
-                        "Пересечение (мин)": ov,
-                        "Урок 1": _lesson_brief(a.lesson),
-                        "Урок 2": _lesson_brief(cur.lesson),
-                        "__sort_rtype": 0 if rtype == "person" else 1,
-                        "__sort_key": rkey,
-                    })
-
-            active.append(cur)
 
+def _conflicts_frame(conflicts_rows: List[Dict[str, Any]]) -> pd.DataFrame:
     conflicts_df = pd.DataFrame(conflicts_rows)
 
     if not conflicts_df.empty:
         # сортировка: сначала люди, потом кабинеты; затем день; затем величина пересечения
+        # служебные __sort_rtype/__sort_key оставляем: по ним работает detect_conflicts_incremental
         day_order = {"Понедельник": 1, "Вторник": 2, "Среда": 3, "Четверг": 4, "Пятница": 5}
         conflicts_df["__day_order"] = conflicts_df["День недели"].map(day_order).fillna(99).astype(int)
         conflicts_df = conflicts_df.sort_values(
             ["__sort_rtype", "__day_order", "Пересечение (мин)"],
             ascending=[True, True, False],
-        ).drop(columns=["__sort_rtype", "__sort_key", "__day_order"])
+        ).drop(columns=["__day_order"]).reset_index(drop=True)
+
+    return conflicts_df
+
 
+def detect_conflicts(
+    df: pd.DataFrame,
+    aliases: Optional[Dict[str, str]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Возвращает:
+      - conflicts_df: строки конфликтов
+      - meta: статистика (сколько событий, сколько пропусков, и т.п.)
+    """
+    events, meta = build_events(df, aliases)
+    if not events:
+        meta["conflicts_found"] = 0
+        return pd.DataFrame(), meta
+
+    conflicts_rows: List[Dict[str, Any]] = []
+    for (rtype, day, rkey), evs in _bucket_events(events).items():
+        conflicts_rows += _scan_bucket(rtype, day, rkey, evs)
+
+    conflicts_df = _conflicts_frame(conflicts_rows)
+
+    meta["conflicts_found"] = int(len(conflicts_df))
+    return conflicts_df, meta
+
+
+def resource_keys_of(
+    row: Dict[str, Any],
+    aliases: Optional[Dict[str, str]] = None,
+) -> Set[Tuple[str, str, str]]:
+    """
+    Корзины (тип ресурса, день, ресурс), в которые попадает строка расписания.
+    Нужны, чтобы после точечной правки пересчитать конфликты только по ним.
+    """
+    day = str(row.get("День недели", "")).strip()
+    keys: Set[Tuple[str, str, str]] = set()
+    for col in ("Педагог", "Тьютор"):
+        val = str(row.get(col, "") or "").strip()
+        if val != "":
+            keys.add(("person", day, _norm_key(_canonical(val, aliases))))
+    room = str(row.get("Комната", "") or "").strip()
+    if room != "":
+        keys.add(("room", day, _norm_key(_canonical(room, aliases))))
+    return keys
+
+
+def detect_conflicts_incremental(
+    base_conflicts: pd.DataFrame,
+    df: pd.DataFrame,
+    affected: Set[Tuple[str, str, str]],
+    aliases: Optional[Dict[str, str]] = None,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Пересчитывает конфликты только для затронутых корзин (тип ресурса, день, ресурс):
+      - из base_conflicts (результат detect_conflicts по исходному df) убираем эти корзины
+      - по уже измененному df собираем события только этих корзин и ищем пересечения заново
+    """
+    meta: Dict[str, Any] = {"affected_buckets": len(affected)}
+    if not affected:
+        meta["conflicts_found"] = int(len(base_conflicts))
+        return base_conflicts, meta
+
+    kept = base_conflicts
+    if not base_conflicts.empty:
+        rtype_by_sort = {0: "person", 1: "room"}
+        bucket_of = zip(
+            base_conflicts["__sort_rtype"].map(rtype_by_sort),
+            base_conflicts["День недели"],
+            base_conflicts["__sort_key"],
+        )
+        kept = base_conflicts[[b not in affected for b in bucket_of]]
+
+    # строки, которые могут попасть в затронутые корзины
+    days = {d for _, d, _ in affected}
+    candidates = df[df["День недели"].isin(days)] if "День недели" in df.columns else df
+    candidates = candidates[[bool(resource_keys_of(r, aliases) & affected) for r in candidates.to_dict("records")]]
+
+    events, ev_meta = build_events(candidates, aliases)
+    if "error" in ev_meta:
+        meta["error"] = ev_meta["error"]
+    events = [ev for ev in events if (ev.resource_type, ev.day, ev.resource_key) in affected]
+
+    new_rows: List[Dict[str, Any]] = []
+    for (rtype, day, rkey), evs in _bucket_events(events).items():
+        new_rows += _scan_bucket(rtype, day, rkey, evs)
+
+    conflicts_df = _conflicts_frame(kept.to_dict("records") + new_rows)
     meta["conflicts_found"] = int(len(conflicts_df))
     return conflicts_df, meta
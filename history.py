@@ -0,0 +1,300 @@
+# history.py
+from __future__ import annotations
+
+import io
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from settings import HISTORY_DIR, HISTORY_MAX_VERSIONS
+from utils import to_time
+
+# Колонки обработанного расписания, которые хранятся в истории
+STORE_COLUMNS = ["День недели", "Номер урока", "Начало", "Конец", "Класс", "Группа",
+                 "Предмет", "Педагог", "Тьютор", "Комната"]
+
+# Ключ «слота» (что стоит на этом месте) и ключ «урока» (кто и что ведет) — для разбора изменений
+SLOT_KEY = ["День недели", "Номер урока", "Класс", "Группа"]
+LESSON_KEY = ["Класс", "Группа", "Предмет", "Педагог"]
+
+
+def _to_store_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Приводим строки к строковому виду: так хеш строки не зависит от dtype
+    (например, 3 vs 3.0 в "Номер урока") и одинаково считается в любой версии.
+    """
+    out = pd.DataFrame(index=range(len(df)))
+    for col in STORE_COLUMNS:
+        vals = df[col].tolist() if col in df.columns else [""] * len(df)
+        if col in ("Начало", "Конец"):
+            out[col] = [v.strftime("%H:%M") if hasattr(v, "strftime") else "" for v in vals]
+        elif col == "Номер урока":
+            out[col] = ["" if v is None or pd.isna(v) else str(int(v)) for v in vals]
+        else:
+            out[col] = ["" if v is None or (isinstance(v, float) and pd.isna(v)) else str(v) for v in vals]
+    return out
+
+
+def _from_store_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    df = frame[STORE_COLUMNS].copy()
+    df["Номер урока"] = pd.to_numeric(df["Номер урока"], errors="coerce").astype("Int64")
+    df["Начало"] = df["Начало"].map(to_time)
+    df["Конец"] = df["Конец"].map(to_time)
+    return df.reset_index(drop=True)
+
+
+def _row_hashes(frame: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy(dtype=np.uint64)
+
+
+class SnapshotHistory:
+    """
+    Ограниченная история обработанных снимков расписания на диске.
+
+    Хранение:
+      - rows.parquet — все уникальные строки всех версий (одна копия на строку, ключ — хеш содержимого)
+      - versions.json — список версий (id, отпечаток, время, число строк)
+      - v<id>.npy — хеши строк версии по порядку (8 байт на строку)
+    """
+
+    def __init__(self, root: str, max_versions: int) -> None:
+        self.root = root
+        self.max_versions = max_versions
+        self._rows: Optional[pd.DataFrame] = None
+        self._rows_mtime: Optional[int] = None
+
+    # ---------- файлы
+
+    @property
+    def _rows_path(self) -> str:
+        return os.path.join(self.root, "rows.parquet")
+
+    @property
+    def _versions_path(self) -> str:
+        return os.path.join(self.root, "versions.json")
+
+    def _hashes_path(self, version_id: int) -> str:
+        return os.path.join(self.root, f"v{version_id}.npy")
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        # пишем во временный файл и подменяем: читатель никогда не увидит половину файла
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    # ---------- чтение
+
+    def versions(self) -> List[Dict[str, Any]]:
+        if not os.path.exists(self._versions_path):
+            return []
+        with open(self._versions_path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _row_store(self) -> pd.DataFrame:
+        # Держим строки в памяти, перечитываем только если файл поменялся (например, другим процессом)
+        mtime = os.stat(self._rows_path).st_mtime_ns if os.path.exists(self._rows_path) else None
+        if self._rows is None or mtime != self._rows_mtime:
+            if mtime is None:
+                self._rows = pd.DataFrame(columns=STORE_COLUMNS, index=pd.Index([], dtype=np.uint64, name="__hash"))
+            else:
+                self._rows = pd.read_parquet(self._rows_path).set_index("__hash")
+            self._rows_mtime = mtime
+        return self._rows
+
+    def hashes(self, version_id: int) -> np.ndarray:
+        return np.load(self._hashes_path(version_id))
+
+    def rows_for(self, hashes: np.ndarray) -> pd.DataFrame:
+        if len(hashes) == 0:
+            return pd.DataFrame(columns=STORE_COLUMNS)
+        return self._row_store().loc[hashes]
+
+    def load(self, version_id: int) -> pd.DataFrame:
+        return _from_store_frame(self.rows_for(self.hashes(version_id)))
+
+    # ---------- запись
+
+    def record(self, df: pd.DataFrame, fingerprint: str) -> Optional[Dict[str, Any]]:
+        """
+        Сохраняет снимок как новую версию. Если он совпадает с последней версией — ничего не делает.
+        Новые строки дописываются в общее хранилище, старые версии сверх лимита удаляются.
+        """
+        versions = self.versions()
+        if versions and versions[-1]["fingerprint"] == fingerprint:
+            return None
+
+        os.makedirs(self.root, exist_ok=True)
+
+        frame = _to_store_frame(df)
+        hashes = _row_hashes(frame)
+
+        store = self._row_store()
+        is_new = ~np.isin(hashes, store.index.to_numpy(dtype=np.uint64))
+        if is_new.any():
+            new_rows = frame[is_new].set_index(pd.Index(hashes[is_new], name="__hash"))
+            new_rows = new_rows[~new_rows.index.duplicated()]
+            store = pd.concat([store, new_rows]) if len(store) else new_rows
+
+        version = {
+            "id": (versions[-1]["id"] + 1) if versions else 1,
+            "fingerprint": fingerprint,
+            "saved_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "rows": int(len(hashes)),
+            "new_rows": int(is_new.sum()),
+        }
+        versions.append(version)
+
+        buf = io.BytesIO()
+        np.save(buf, hashes)
+        self._write_atomic(self._hashes_path(version["id"]), buf.getvalue())
+
+        dropped = versions[:-self.max_versions] if len(versions) > self.max_versions else []
+        versions = versions[len(dropped):]
+
+        if dropped:
+            # оставляем только строки, на которые ссылается хоть одна версия
+            alive = np.unique(np.concatenate([self.hashes(v["id"]) for v in versions]))
+            store = store[store.index.isin(alive)]
+
+        if is_new.any() or dropped:
+            buf = io.BytesIO()
+            store.reset_index().to_parquet(buf, compression="zstd", index=False)
+            self._write_atomic(self._rows_path, buf.getvalue())
+            self._rows, self._rows_mtime = store, os.stat(self._rows_path).st_mtime_ns
+
+        self._write_atomic(self._versions_path, json.dumps(versions, ensure_ascii=False, indent=1).encode("utf-8"))
+        for v in dropped:
+            try:
+                os.remove(self._hashes_path(v["id"]))
+            except FileNotFoundError:
+                pass
+
+        return version
+
+
+def _brief(row: Optional[Dict[str, Any]]) -> str:
+    if row is None:
+        return ""
+    grp = f" [{row['Группа']}]" if row["Группа"] else ""
+    return (
+        f"{row['День недели']}, {row['Номер урока']} урок {row['Начало']}-{row['Конец']}: "
+        f"{row['Предмет']}{grp}; пед. {row['Педагог']}; тьют. {row['Тьютор']}; каб. {row['Комната']}"
+    )
+
+
+def _pair_by(
+    removed: List[Dict[str, Any]],
+    added: List[Dict[str, Any]],
+    key: List[str],
+) -> Tuple[List[Tuple[Dict[str, Any], Dict[str, Any]]], List[Dict[str, Any]], List[Dict[str, Any]]]:
+    # Хеш-соединение двух списков строк по ключу; пары 1:1 в порядке следования
+    pool: Dict[Tuple, List[Dict[str, Any]]] = {}
+    for r in added:
+        pool.setdefault(tuple(r[k] for k in key), []).append(r)
+
+    pairs, rest_removed = [], []
+    for r in removed:
+        bucket = pool.get(tuple(r[k] for k in key))
+        if bucket:
+            pairs.append((r, bucket.pop(0)))
+        else:
+            rest_removed.append(r)
+    rest_added = [r for bucket in pool.values() for r in bucket]
+    return pairs, rest_removed, rest_added
+
+
+def _multiset_diff(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Хеши из a, которых в b меньше, с учетом повторов: [1, 1, 2] - [1] -> [1, 2]."""
+    ua, ca = np.unique(a, return_counts=True)
+    if len(b) == 0:
+        return np.repeat(ua, ca)
+    ub, cb = np.unique(b, return_counts=True)
+    pos = np.minimum(np.searchsorted(ub, ua), len(ub) - 1)
+    in_b = np.where(ub[pos] == ua, cb[pos], 0)
+    return np.repeat(ua, np.clip(ca - in_b, 0, None))
+
+
+def diff_versions(history: SnapshotHistory, old_id: int, new_id: int) -> pd.DataFrame:
+    """
+    Что изменилось между версиями old_id и new_id.
+    Одинаковые строки отсекаются сравнением хешей (как мультимножеств: дубль строки тоже изменение);
+    оставшиеся разбираются так:
+      - тот же слот (день, урок, класс, группа) — «изменено»
+      - тот же урок (класс, группа, предмет, педагог) в другом слоте — «перенесено»
+      - остальное — «добавлено» / «удалено»
+    """
+    old_h = history.hashes(old_id)
+    new_h = history.hashes(new_id)
+    removed = history.rows_for(_multiset_diff(old_h, new_h)).to_dict("records")
+    added = history.rows_for(_multiset_diff(new_h, old_h)).to_dict("records")
+
+    changed, removed, added = _pair_by(removed, added, SLOT_KEY)
+    moved, removed, added = _pair_by(removed, added, LESSON_KEY)
+
+    out: List[Dict[str, Any]] = []
+    for kind, pairs in (("изменено", changed), ("перенесено", moved)):
+        for old, new in pairs:
+            out.append({"Изменение": kind, "old": old, "new": new})
+    out += [{"Изменение": "добавлено", "old": None, "new": r} for r in added]
+    out += [{"Изменение": "удалено", "old": r, "new": None} for r in removed]
+
+    rows = []
+    for item in out:
+        old, new = item["old"], item["new"]
+        base = new or old
+        rows.append({
+            "Изменение": item["Изменение"],
+            "Класс": base["Класс"],
+            "Группа": base["Группа"],
+            "Было": _brief(old),
+            "Стало": _brief(new),
+            # для фильтров по педагогу/кабинету: значения «до» и «после»
+            "__people": sorted({r[c] for r in (old, new) if r for c in ("Педагог", "Тьютор") if r[c]}),
+            "__rooms": sorted({r["Комната"] for r in (old, new) if r and r["Комната"]}),
+        })
+
+    diff_df = pd.DataFrame(rows, columns=["Изменение", "Класс", "Группа", "Было", "Стало", "__people", "__rooms"])
+    if not diff_df.empty:
+        kind_order = {"изменено": 0, "перенесено": 1, "добавлено": 2, "удалено": 3}
+        diff_df["__kind_order"] = diff_df["Изменение"].map(kind_order)
+        diff_df = diff_df.sort_values(["__kind_order", "Класс", "Группа"]).drop(columns="__kind_order")
+    return diff_df.reset_index(drop=True)
+
+
+@st.cache_resource
+def get_history() -> SnapshotHistory:
+    return SnapshotHistory(HISTORY_DIR, HISTORY_MAX_VERSIONS)
+
+
+@st.cache_resource
+def _last_recorded() -> Dict[str, Any]:
+    # отпечаток последнего записанного снимка (один на процесс) + блокировка для параллельных сессий
+    return {"lock": threading.Lock(), "fingerprint": None}
+
+
+def record_snapshot(df: pd.DataFrame, fingerprint: str) -> Optional[Dict[str, Any]]:
+    """
+    Записывает снимок, если он отличается от последнего записанного.
+    Повторные прогоны с тем же снимком не трогают диск, а возврат к прежнему снимку
+    (A -> B -> A, например после отмены правки) записывается как новая версия.
+    """
+    state = _last_recorded()
+    with state["lock"]:
+        if state["fingerprint"] == fingerprint:
+            return None
+        version = get_history().record(df, fingerprint)
+        state["fingerprint"] = fingerprint
+        return version
+
+
+@st.cache_resource(max_entries=32)
+def get_diff(old_id: int, new_id: int) -> pd.DataFrame:
+    # версии неизменяемы, поэтому разницу можно кэшировать по паре id
+    return diff_versions(get_history(), old_id, new_id)
@@ -0,0 +1,146 @@
+# intervals.py
+from __future__ import annotations
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import time
+from typing import Dict, Any, List, Tuple, Optional
+
+import pandas as pd
+import streamlit as st
+
+from conflicts import _norm_key, _time_to_min
+
+# Какие ресурсы индексируем: тип -> колонка обработанного расписания
+RESOURCE_COLUMNS = {
+    "teacher": "Педагог",
+    "tutor": "Тьютор",
+    "room": "Комната",
+    "class": "Класс",
+}
+
+
+@dataclass
+class _Track:
+    """
+    Уроки одного ресурса за один день, отсортированные по началу.
+    max_end — префиксный максимум концов: позволяет остановить обратный проход,
+    как только более ранние уроки гарантированно закончились (работает и при пересечениях).
+    """
+    starts: List[int] = field(default_factory=list)
+    ends: List[int] = field(default_factory=list)
+    max_end: List[int] = field(default_factory=list)
+    lessons: List[Dict[str, Any]] = field(default_factory=list)
+
+    def overlapping(self, a_min: int, b_min: int) -> List[Dict[str, Any]]:
+        # Уроки, пересекающиеся с [a_min, b_min): start < b_min и end > a_min
+        out = []
+        i = bisect_left(self.starts, b_min) - 1
+        while i >= 0 and self.max_end[i] > a_min:
+            if self.ends[i] > a_min:
+                out.append(self.lessons[i])
+            i -= 1
+        out.reverse()
+        return out
+
+    def at(self, minute: int) -> List[Dict[str, Any]]:
+        return self.overlapping(minute, minute + 1)
+
+    def next_after(self, minute: int) -> Optional[Dict[str, Any]]:
+        i = bisect_right(self.starts, minute)
+        return self.lessons[i] if i < len(self.lessons) else None
+
+
+class IntervalIndex:
+    """
+    Индекс уроков по (тип ресурса, день, ресурс).
+    Запросы «что идет в момент t» / «что пересекается с [a, b)» — за O(log n + k).
+    """
+
+    def __init__(self) -> None:
+        self._tracks: Dict[Tuple[str, str, str], _Track] = {}
+        self._labels: Dict[str, Dict[str, str]] = {kind: {} for kind in RESOURCE_COLUMNS}
+
+    def _track(self, kind: str, day: str, label: str) -> Optional[_Track]:
+        return self._tracks.get((kind, day, _norm_key(label)))
+
+    def resources(self, kind: str) -> List[str]:
+        return sorted(self._labels.get(kind, {}).values(), key=str.casefold)
+
+    def at(self, kind: str, label: str, day: str, t: time) -> List[Dict[str, Any]]:
+        tr = self._track(kind, day, label)
+        return tr.at(_time_to_min(t)) if tr else []
+
+    def between(self, kind: str, label: str, day: str, start: time, end: time) -> List[Dict[str, Any]]:
+        tr = self._track(kind, day, label)
+        return tr.overlapping(_time_to_min(start), _time_to_min(end)) if tr else []
+
+    def next_after(self, kind: str, label: str, day: str, t: time) -> Optional[Dict[str, Any]]:
+        tr = self._track(kind, day, label)
+        return tr.next_after(_time_to_min(t)) if tr else None
+
+
+def build_interval_index(df: pd.DataFrame) -> IntervalIndex:
+    """
+    Строит IntervalIndex по обработанному расписанию.
+    Интервалы считаются так же, как в conflicts.build_events (start_min/end_min),
+    строки без дня/времени или с пустым интервалом пропускаются.
+    """
+    index = IntervalIndex()
+    if df.empty:
+        return index
+
+    raw: Dict[Tuple[str, str, str], List[Tuple[int, int, Dict[str, Any]]]] = {}
+
+    for r in df.to_dict("records"):
+        day = str(r.get("День недели", "")).strip()
+        start = r.get("Начало", None)
+        end = r.get("Конец", None)
+        if day == "" or not isinstance(start, time) or not isinstance(end, time):
+            continue
+
+        smin = _time_to_min(start)
+        emin = _time_to_min(end)
+        if emin <= smin:
+            continue
+
+        lesson = {
+            "День недели": day,
+            "Номер урока": r.get("Номер урока"),
+            "Начало": start,
+            "Конец": end,
+            "Класс": str(r.get("Класс", "")).strip(),
+            "Группа": str(r.get("Группа", "")).strip(),
+            "Предмет": str(r.get("Предмет", "")).strip(),
+            "Педагог": str(r.get("Педагог", "")).strip(),
+            "Тьютор": str(r.get("Тьютор", "")).strip(),
+            "Комната": str(r.get("Комната", "")).strip(),
+        }
+
+        for kind, col in RESOURCE_COLUMNS.items():
+            label = lesson[col]
+            if label == "":
+                continue
+            key = _norm_key(label)
+            index._labels[kind].setdefault(key, label)
+            raw.setdefault((kind, day, key), []).append((smin, emin, lesson))
+
+    for track_key, items in raw.items():
+        items.sort(key=lambda x: (x[0], x[1]))
+        tr = _Track()
+        running = -1
+        for smin, emin, lesson in items:
+            running = max(running, emin)
+            tr.starts.append(smin)
+            tr.ends.append(emin)
+            tr.max_end.append(running)
+            tr.lessons.append(lesson)
+        index._tracks[track_key] = tr
+
+    return index
+
+
+@st.cache_resource(max_entries=4)
+def get_interval_index(_df: pd.DataFrame, fingerprint: str) -> IntervalIndex:
+    # df не хешируем (дорого) — ключ кэша задает отпечаток снимка
+    return build_interval_index(_df)
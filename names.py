@@ -0,0 +1,235 @@
+# names.py
+from __future__ import annotations
+
+import re
+from collections import Counter
+from itertools import combinations
+from typing import Dict, Any, Iterable, List, Set, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from settings import NAME_ALIASES, NAME_AUTO_MERGE
+from conflicts import _canonical, _norm_key
+
+# Латинские буквы, которые в кириллическом тексте выглядят как русские ("Иванова" с латинской "a")
+_HOMOGLYPHS = str.maketrans({
+    "a": "а", "b": "в", "c": "с", "e": "е", "h": "н", "k": "к", "m": "м",
+    "o": "о", "p": "р", "t": "т", "x": "х", "y": "у", "ё": "е",
+})
+
+_PUNCT_RE = re.compile(r"[.,;:()\[\]\"'№#]+")
+_ROOM_WORDS_RE = re.compile(r"\b(каб(инет)?|ауд(итория)?|комн(ата)?)\b")
+# Пунктуация в номере кабинета, кроме разделителей между цифрами ("1.2", "3,4")
+_ROOM_PUNCT_RE = re.compile(r"(?<!\d)[.,;:()\[\]\"'№#]+|[.,;:()\[\]\"'№#]+(?!\d)")
+
+# Фамилии короче не сравниваем «с опечаткой»: слишком много случайных совпадений
+MIN_FUZZY_SURNAME = 5
+
+
+def fold_person(name: str) -> Tuple[str, str]:
+    """
+    "Иванова А.А." -> ("иванова", "аа"); "Ивaнова" (латинская a) -> ("иванова", "").
+    Возвращает (фамилия, инициалы) в приведенном виде.
+    """
+    s = _PUNCT_RE.sub(" ", _norm_key(name).translate(_HOMOGLYPHS))
+    parts = s.split()
+    if not parts:
+        return "", ""
+    surname = parts[0]
+    # "Иванова Анна Петровна" и "Иванова А.П." дают одинаковые инициалы
+    initials = "".join(p[0] for p in parts[1:])
+    return surname, initials
+
+
+def fold_room(name: str) -> str:
+    """ "Каб. 12", "кабинет №12", "12" -> "12"; "1.2" остается "1.2" (это другой кабинет) """
+    s = _norm_key(name).translate(_HOMOGLYPHS)
+    s = _ROOM_WORDS_RE.sub(" ", s)
+    parts = _ROOM_PUNCT_RE.sub(" ", s).split()
+    # пробел убираем ("12 а" = "12а"), но не между цифрами: "1 2" — не "12"
+    return "".join(
+        (" " if i and parts[i - 1][-1].isdigit() and p[0].isdigit() else "") + p for i, p in enumerate(parts)
+    )
+
+
+def levenshtein(a: str, b: str, max_dist: int) -> int:
+    """Расстояние Левенштейна с отсечкой: если больше max_dist — возвращаем max_dist + 1."""
+    if abs(len(a) - len(b)) > max_dist:
+        return max_dist + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, start=1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, start=1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+        if min(cur) > max_dist:
+            return max_dist + 1
+        prev = cur
+    return prev[-1]
+
+
+def _initials_compatible(a: str, b: str) -> bool:
+    # "" ~ "а" ~ "ап": одно — начало другого
+    return a.startswith(b) or b.startswith(a)
+
+
+def _deletion_keys(s: str) -> Set[str]:
+    # Ключи блокировки: слово и все его варианты без одной буквы.
+    # Если расстояние Левенштейна между словами <= 1, у них есть общий ключ.
+    return {s} | {s[:i] + s[i + 1:] for i in range(len(s))}
+
+
+def find_person_duplicates(names: Iterable[str]) -> List[Dict[str, Any]]:
+    """
+    Похожие имена людей. Кандидаты ищутся блокировкой по приведенной фамилии
+    (точное совпадение + ключи «без одной буквы»), расстояние считается только внутри блоков.
+      - высокая уверенность: фамилии совпадают после приведения, инициалы совместимы
+      - средняя: фамилии отличаются на одну букву, инициалы совместимы и не пустые
+    """
+    folded = {n: fold_person(n) for n in set(names) if n.strip() != ""}
+
+    by_surname: Dict[str, List[str]] = {}
+    for name, (surname, _) in folded.items():
+        if surname:
+            by_surname.setdefault(surname, []).append(name)
+
+    blocks: Dict[str, Set[str]] = {}
+    for surname in by_surname:
+        if len(surname) >= MIN_FUZZY_SURNAME:
+            for key in _deletion_keys(surname):
+                blocks.setdefault(key, set()).add(surname)
+
+    surname_pairs: Set[Tuple[str, str]] = {(s, s) for s in by_surname}
+    for members in blocks.values():
+        for sa, sb in combinations(sorted(members), 2):
+            surname_pairs.add((sa, sb))
+
+    out: List[Dict[str, Any]] = []
+    for sa, sb in sorted(surname_pairs):
+        if sa == sb:
+            name_pairs = combinations(sorted(by_surname[sa]), 2)
+        elif levenshtein(sa, sb, 1) == 1:
+            name_pairs = ((a, b) for a in sorted(by_surname[sa]) for b in sorted(by_surname[sb]))
+        else:
+            continue
+
+        for a, b in name_pairs:
+            if _norm_key(a) == _norm_key(b):
+                continue
+            ia, ib = folded[a][1], folded[b][1]
+            if not _initials_compatible(ia, ib):
+                continue
+            if sa == sb:
+                if ia == ib:
+                    reason = "одинаково после приведения (регистр/латиница/точки)"
+                else:
+                    reason = "совпадает фамилия, инициалы дополняют друг друга"
+                out.append({"Имя 1": a, "Имя 2": b, "Причина": reason, "Уверенность": "высокая"})
+            elif ia and ib:
+                out.append({"Имя 1": a, "Имя 2": b, "Причина": "фамилии отличаются на одну букву",
+                            "Уверенность": "средняя"})
+    return out
+
+
+def find_room_duplicates(names: Iterable[str]) -> List[Dict[str, Any]]:
+    """Кабинеты считаем дублями только при полном совпадении после приведения ("Каб. 12" = "12")."""
+    blocks: Dict[str, List[str]] = {}
+    for n in set(names):
+        if n.strip() != "":
+            blocks.setdefault(fold_room(n), []).append(n)
+
+    out: List[Dict[str, Any]] = []
+    for members in blocks.values():
+        for a, b in combinations(sorted(members), 2):
+            if _norm_key(a) != _norm_key(b):
+                out.append({"Имя 1": a, "Имя 2": b, "Причина": "одинаково после приведения",
+                            "Уверенность": "высокая"})
+    return out
+
+
+def _auto_aliases(counts: Counter, fold) -> Dict[str, str]:
+    """
+    Склеивает варианты написания с общей «приведенной» формой fold(name).
+    Каноническое имя — самое частое написание в расписании.
+    """
+    groups: Dict[Any, List[str]] = {}
+    for name in counts:
+        groups.setdefault(fold(name), []).append(name)
+
+    aliases: Dict[str, str] = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        canonical = max(members, key=lambda n: (counts[n], len(n)))
+        for n in members:
+            if _norm_key(n) != _norm_key(canonical):
+                aliases[_norm_key(n)] = canonical
+    return aliases
+
+
+def _person_aliases(counts: Counter) -> Dict[str, str]:
+    """
+    Для людей группа — одна фамилия, если все инициалы являются началом самых длинных.
+    Если встречаются несовместимые инициалы ("Иванова А." и "Иванова Б."), непонятно,
+    к кому отнести "Иванова" — склеиваем только полностью одинаковые варианты.
+    """
+    by_surname: Dict[str, List[str]] = {}
+    for name in counts:
+        surname, _ = fold_person(name)
+        if surname:
+            by_surname.setdefault(surname, []).append(name)
+
+    aliases: Dict[str, str] = {}
+    for members in by_surname.values():
+        if len(members) < 2:
+            continue
+        longest = max((fold_person(n)[1] for n in members), key=len)
+        if all(longest.startswith(fold_person(n)[1]) for n in members):
+            aliases.update(_auto_aliases(Counter({n: counts[n] for n in members}), lambda n: fold_person(n)[0]))
+        else:
+            aliases.update(_auto_aliases(Counter({n: counts[n] for n in members}), fold_person))
+    return aliases
+
+
+def analyze_names(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """
+    Проверка качества имен в расписании.
+    Возвращает:
+      - duplicates_df: пары похожих имен (Тип, Имя 1, Имя 2, Причина, Уверенность, Склеено);
+        «Склеено» — объединены ли они на самом деле при поиске конфликтов
+      - aliases: нормализованный ключ варианта -> каноническое имя
+        (ручные NAME_ALIASES + при NAME_AUTO_MERGE высокоуверенные совпадения)
+    """
+    people: Counter = Counter()
+    rooms: Counter = Counter()
+    for col in ("Педагог", "Тьютор"):
+        if col in df.columns:
+            people.update(v.strip() for v in df[col].astype(str) if v.strip() != "")
+    if "Комната" in df.columns:
+        rooms.update(v.strip() for v in df["Комната"].astype(str) if v.strip() != "")
+
+    aliases: Dict[str, str] = {}
+    if NAME_AUTO_MERGE:
+        aliases.update(_person_aliases(people))
+        aliases.update(_auto_aliases(rooms, fold_room))
+    for variant, canonical in NAME_ALIASES.items():
+        aliases[_norm_key(variant)] = canonical
+
+    def merged(a: str, b: str) -> str:
+        # то же правило, что и в conflicts.build_events: вариант -> каноническое имя
+        return "да" if _norm_key(_canonical(a, aliases)) == _norm_key(_canonical(b, aliases)) else "нет"
+
+    rows = [{"Тип": "Педагог/тьютор", **r} for r in find_person_duplicates(people)]
+    rows += [{"Тип": "Кабинет", **r} for r in find_room_duplicates(rooms)]
+    for r in rows:
+        r["Склеено"] = merged(r["Имя 1"], r["Имя 2"])
+    duplicates_df = pd.DataFrame(rows, columns=["Тип", "Имя 1", "Имя 2", "Причина", "Уверенность", "Склеено"])
+
+    return duplicates_df, aliases
+
+
+@st.cache_resource(max_entries=4)
+def get_name_quality(_df: pd.DataFrame, fingerprint: str) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    # один раз на снимок
+    return analyze_names(_df)
+
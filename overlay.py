@@ -0,0 +1,327 @@
+# overlay.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, time, timedelta
+import hashlib
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from settings import WEEKDAY_MAP, OVERLAY_REFRESH_SECONDS
+from source import has_overlay_source, overlay_local_mtime, load_overlay_table, class_levels
+from conflicts import detect_conflicts, detect_conflicts_incremental, resource_keys_of
+from transform import snapshot_fingerprint
+from names import get_name_quality
+from utils import safe_str, to_date, to_time
+
+ACTION_REPLACE = "замена"
+ACTION_CANCEL = "отмена"
+ACTION_ADD = "добавить"
+
+# Поля урока, которые можно переопределить заменой
+PATCH_FIELDS = ["Предмет", "Педагог", "Тьютор", "Комната"]
+# Значение-заглушка «очистить поле» (например, тьютора в этот день нет)
+CLEAR_MARKS = {"-", "—", "–"}
+
+DAY_NAMES = list(WEEKDAY_MAP.values())
+
+
+@dataclass(frozen=True)
+class OverlayChange:
+    line: int                   # номер строки в файле замен (для диагностики)
+    date: date
+    day: str                    # "Понедельник", ... (по дате)
+    num: int
+    class_name: str
+    group: str                  # "" — все группы класса
+    action: str
+    values: Tuple[Tuple[str, str], ...]  # (колонка, новое значение)
+    start: Optional[time]
+    end: Optional[time]
+    comment: str
+
+
+def _parse_action(val: str) -> Optional[str]:
+    s = val.strip().casefold()
+    if s == "" or s.startswith("зам"):
+        return ACTION_REPLACE
+    if s.startswith("отм"):
+        return ACTION_CANCEL
+    if s.startswith("доб"):
+        return ACTION_ADD
+    return None
+
+
+def parse_overlay(
+    df_raw: pd.DataFrame,
+    levels: Optional[Dict[str, Tuple[str, str]]] = None,
+) -> Tuple[List[OverlayChange], Dict[str, Any]]:
+    """
+    Превращает сырую таблицу замен в список OverlayChange.
+    Строки с ошибками пропускаются и попадают в meta["warnings"].
+    levels — известные классы (meta["class_levels"] загруженной таблицы, вместе с найденными
+    по заголовку); по умолчанию — только классы из настроек.
+    """
+    meta: Dict[str, Any] = {"warnings": [], "rows_total": int(len(df_raw))}
+    changes: List[OverlayChange] = []
+    known_classes = levels if levels is not None else class_levels()
+
+    for i, r in enumerate(df_raw.to_dict("records"), start=2):  # 1-я строка — заголовок
+        d = to_date(safe_str(r.get("Дата")))
+        if d is None:
+            meta["warnings"].append(f"Строка {i}: не распознана дата '{safe_str(r.get('Дата'))}'")
+            continue
+        if d.weekday() >= len(DAY_NAMES):
+            meta["warnings"].append(f"Строка {i}: {d:%d.%m.%Y} — выходной день")
+            continue
+
+        try:
+            num = int(float(safe_str(r.get("Номер урока"))))
+        except ValueError:
+            meta["warnings"].append(f"Строка {i}: не распознан номер урока '{safe_str(r.get('Номер урока'))}'")
+            continue
+
+        class_name = safe_str(r.get("Класс"))
+        if class_name not in known_classes:
+            meta["warnings"].append(f"Строка {i}: неизвестный класс '{class_name}'")
+            continue
+
+        action = _parse_action(safe_str(r.get("Действие")))
+        if action is None:
+            meta["warnings"].append(f"Строка {i}: неизвестное действие '{safe_str(r.get('Действие'))}'")
+            continue
+
+        values = tuple(
+            (col, "" if safe_str(r.get(col)) in CLEAR_MARKS else safe_str(r.get(col)))
+            for col in PATCH_FIELDS
+            if safe_str(r.get(col)) != ""
+        )
+
+        changes.append(OverlayChange(
+            line=i,
+            date=d,
+            day=DAY_NAMES[d.weekday()],
+            num=num,
+            class_name=class_name,
+            group=safe_str(r.get("Группа")),
+            action=action,
+            values=values,
+            start=to_time(safe_str(r.get("Начало"))),
+            end=to_time(safe_str(r.get("Конец"))),
+            comment=safe_str(r.get("Комментарий")),
+        ))
+
+    meta["changes_total"] = len(changes)
+    return changes, meta
+
+
+def _overlay_result(
+    df_raw: pd.DataFrame,
+    levels: Optional[Dict[str, Tuple[str, str]]],
+) -> Tuple[List[OverlayChange], Dict[str, Any]]:
+    changes, meta = parse_overlay(df_raw, levels)
+    meta["fingerprint"] = hashlib.sha1(repr(changes).encode("utf-8")).hexdigest()[:16]
+    return changes, meta
+
+
+@st.cache_data
+def _load_overlay_local(
+    mtime_ns: int,
+    levels: Optional[Dict[str, Tuple[str, str]]],
+) -> Tuple[List[OverlayChange], Dict[str, Any]]:
+    # mtime — ключ кэша: пока файл не сохранили заново (и не поменялся набор классов), повторно не читаем
+    return _overlay_result(load_overlay_table(), levels)
+
+
+@st.cache_data(ttl=OVERLAY_REFRESH_SECONDS)
+def _load_overlay_url(levels: Optional[Dict[str, Tuple[str, str]]]) -> Tuple[List[OverlayChange], Dict[str, Any]]:
+    return _overlay_result(load_overlay_table(), levels)
+
+
+def _no_overlay(warning: str = "") -> Tuple[List[OverlayChange], Dict[str, Any]]:
+    return [], {"warnings": [warning] if warning else [], "fingerprint": "none", "changes_total": 0}
+
+
+def load_overlay(
+    levels: Optional[Dict[str, Tuple[str, str]]] = None,
+) -> Tuple[List[OverlayChange], Dict[str, Any]]:
+    """
+    Замены из настроенного источника (кэшируются отдельно от основной таблицы).
+    Файл замен правят часто, поэтому ошибка его чтения не роняет приложение:
+    показываем базовое расписание, а ошибку — в meta["warnings"].
+    """
+    if not has_overlay_source():
+        return _no_overlay()
+    try:
+        mtime = overlay_local_mtime()
+        if mtime is not None:
+            return _load_overlay_local(mtime, levels)
+        return _load_overlay_url(levels)
+    except FileNotFoundError as e:
+        return _no_overlay(str(e))
+    except Exception as e:
+        return _no_overlay(f"Не удалось загрузить замены: {e}")
+
+
+def week_start_of(d: date) -> date:
+    return d - timedelta(days=d.weekday())
+
+
+def apply_overlay(
+    df: pd.DataFrame,
+    changes: List[OverlayChange],
+    week_start: date,
+    aliases: Optional[Dict[str, str]] = None,
+    levels: Optional[Dict[str, Tuple[str, str]]] = None,
+) -> Tuple[pd.DataFrame, Set[Tuple[str, str, str]], Dict[str, Any]]:
+    """
+    Накладывает замены недели week_start поверх обработанного расписания.
+    Возвращает:
+      - новый df (исходный не меняется) с колонкой "Изменение"
+      - затронутые корзины (тип ресурса, день, ресурс) — для пересчета конфликтов
+      - meta: сколько применено и какие строки замен ни к чему не подошли
+    """
+    meta: Dict[str, Any] = {"applied": 0, "unmatched": []}
+    levels = levels if levels is not None else class_levels()
+    week_end = week_start + timedelta(days=7)
+    todo = [ch for ch in changes if week_start <= ch.date < week_end]
+
+    affected: Set[Tuple[str, str, str]] = set()
+    if not todo:
+        return df, affected, meta
+
+    patched = df.copy()
+    patched["Изменение"] = ""
+    added: List[Dict[str, Any]] = []
+
+    day_col = patched["День недели"]
+    num_col = pd.to_numeric(patched["Номер урока"], errors="coerce")
+    class_col = patched["Класс"]
+
+    for ch in todo:
+        mask = (day_col == ch.day) & (num_col == ch.num) & (class_col == ch.class_name)
+        if ch.group != "":
+            mask &= patched["Группа"] == ch.group
+        hit = patched.index[mask]
+
+        for row in patched.loc[hit].to_dict("records"):
+            affected |= resource_keys_of(row, aliases)
+
+        if ch.action == ACTION_CANCEL:
+            if len(hit) == 0:
+                meta["unmatched"].append(ch.line)
+                continue
+            patched = patched.drop(index=hit)
+            day_col, num_col, class_col = patched["День недели"], num_col.drop(index=hit), patched["Класс"]
+            meta["applied"] += 1
+            continue
+
+        if len(hit) > 0 and ch.action == ACTION_REPLACE:
+            for col, val in ch.values:
+                patched.loc[hit, col] = val
+            if ch.start is not None:
+                patched.loc[hit, "Начало"] = pd.Series([ch.start] * len(hit), index=hit, dtype=object)
+            if ch.end is not None:
+                patched.loc[hit, "Конец"] = pd.Series([ch.end] * len(hit), index=hit, dtype=object)
+            patched.loc[hit, "Изменение"] = ch.comment or ACTION_REPLACE
+            for row in patched.loc[hit].to_dict("records"):
+                affected |= resource_keys_of(row, aliases)
+            meta["applied"] += 1
+            continue
+
+        if ch.action == ACTION_REPLACE:
+            # заменять нечего (опечатка в номере урока/классе) — не создаем «фантомный» урок, а сообщаем
+            meta["unmatched"].append(ch.line)
+            continue
+
+        # Добавление урока (время берем из строки замен или из того же слота другого класса)
+        start, end = ch.start, ch.end
+        if start is None or end is None:
+            # берем время того же урока у класса того же уровня (и того же кампуса)
+            same_level = [c for c, campus_level in levels.items() if campus_level == levels[ch.class_name]]
+            ref = df[(df["День недели"] == ch.day) & (pd.to_numeric(df["Номер урока"], errors="coerce") == ch.num)
+                     & df["Класс"].isin(same_level)]
+            if ref.empty:
+                meta["unmatched"].append(ch.line)
+                continue
+            start = start or ref.iloc[0]["Начало"]
+            end = end or ref.iloc[0]["Конец"]
+
+        row = {
+            "День недели": ch.day,
+            "Номер урока": ch.num,
+            "Начало": start,
+            "Конец": end,
+            "Класс": ch.class_name,
+            "Группа": ch.group,
+            "Предмет": "",
+            "Педагог": "",
+            "Тьютор": "",
+            "Комната": "",
+            "Изменение": ch.comment or "добавлено",
+        }
+        row.update(dict(ch.values))
+        if "Кампус" in patched.columns:
+            row["Кампус"] = levels[ch.class_name][0]
+        if row["Предмет"] == "":
+            meta["unmatched"].append(ch.line)
+            continue
+        added.append(row)
+        affected |= resource_keys_of(row, aliases)
+        meta["applied"] += 1
+
+    if added:
+        patched = pd.concat([patched, pd.DataFrame(added)], ignore_index=True)
+        day_order = {d: i for i, d in enumerate(DAY_NAMES, start=1)}
+        patched["__day_order"] = patched["День недели"].map(day_order).fillna(99).astype(int)
+        patched = patched.sort_values(["__day_order", "Номер урока", "Класс", "Группа"]).drop(columns="__day_order")
+
+    return patched, affected, meta
+
+
+@st.cache_resource(max_entries=4)
+def _base_conflicts(_df: pd.DataFrame, fingerprint: str) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    _, aliases = get_name_quality(_df, fingerprint)
+    return detect_conflicts(_df, aliases)
+
+
+@st.cache_resource(max_entries=16)
+def _patched_view(
+    _df: pd.DataFrame,
+    fingerprint: str,
+    _changes: List[OverlayChange],
+    overlay_fingerprint: str,
+    week_start: date,
+    _levels: Optional[Dict[str, Tuple[str, str]]],
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any], Dict[str, Any], str]:
+    # _levels не хешируем: набор классов определяется самой таблицей (fingerprint)
+    base_conflicts, base_meta = _base_conflicts(_df, fingerprint)
+    _, aliases = get_name_quality(_df, fingerprint)
+    patched, affected, apply_meta = apply_overlay(_df, _changes, week_start, aliases, _levels)
+    if not affected and patched is _df:
+        return _df, base_conflicts, base_meta, apply_meta, fingerprint
+
+    conflicts_df, inc_meta = detect_conflicts_incremental(base_conflicts, patched, affected, aliases)
+    conflicts_meta = {**base_meta, **inc_meta}
+    return patched, conflicts_df, conflicts_meta, apply_meta, snapshot_fingerprint(patched)
+
+
+def get_schedule_view(
+    df: pd.DataFrame,
+    fingerprint: str,
+    week_start: date,
+    levels: Optional[Dict[str, Tuple[str, str]]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame, Dict[str, Any], Dict[str, Any], str]:
+    """
+    Расписание недели week_start с учетом замен + конфликты по нему.
+    Базовая таблица не перечитывается; конфликты пересчитываются только по затронутым ресурсам.
+    levels — meta["class_levels"] таблицы (классы из настроек и найденные по заголовку).
+    Возвращает (df, conflicts_df, conflicts_meta, overlay_meta, fingerprint_вида).
+    """
+    changes, overlay_meta = load_overlay(levels)
+    patched, conflicts_df, conflicts_meta, apply_meta, view_fingerprint = _patched_view(
+        df, fingerprint, changes, overlay_meta["fingerprint"], week_start, levels
+    )
+    return patched, conflicts_df, conflicts_meta, {**overlay_meta, **apply_meta}, view_fingerprint
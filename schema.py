@@ -0,0 +1,164 @@
+# schema.py
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Tuple
+
+from settings import CLASS_CONFIGS, DISCOVER_CLASSES
+
+# Колонки блока класса: "<класс> Урок / Педагог / Тьютор / Комната"
+CLASS_COLUMN_RE = re.compile(r"^(?P<cls>.+?) (?P<part>Урок|Педагог|Тьютор|Комната)$")
+PART_KEYS = {"Урок": "subject", "Педагог": "teacher", "Тьютор": "tutor", "Комната": "room"}
+
+DAY_COLUMN = "ДН"
+# Колонки сетки звонков: уровень -> (тип, номер, начало, конец)
+TIMESLOT_COLUMNS = {
+    "primary": ("Тип началка", "Номер слота", "Начало началка", "Конец началка"),
+    "secondary": ("Тип старшая", "Номер старшая", "Начало старшая", "Конец старшая"),
+}
+
+
+@dataclass(frozen=True)
+class ClassBlock:
+    name: str
+    level: str
+    subject: Optional[int]
+    teacher: Optional[int]
+    tutor: Optional[int]
+    room: Optional[int]
+
+
+@dataclass(frozen=True)
+class ExtractionPlan:
+    """
+    Что и откуда брать в сырой таблице — номера колонок, а не названия.
+    Строится один раз на раскладку заголовка (см. compile_plan) и затем применяется
+    к строкам-массивам без поиска колонок по имени.
+    """
+    day: Optional[int]
+    timeslots: Dict[str, Tuple[Optional[int], ...]]   # уровень -> позиции (тип, номер, начало, конец)
+    classes: Tuple[ClassBlock, ...]
+    missing_columns: Tuple[str, ...]
+    discovered_classes: Tuple[str, ...] = field(default=())  # найдены в заголовке, но нет в настройках
+    columns: Tuple[str, ...] = field(default=())  # заголовок, по которому построен план
+
+    def layout(self) -> Dict[str, Any]:
+        """Краткое описание раскладки — для сравнения между загрузками."""
+        return {"classes": [c.name for c in self.classes], "columns": list(self.columns)}
+
+
+def infer_level(class_name: str) -> str:
+    # Класса нет в настройках: "1".."4" (и классы без номера, как "Старт") — началка, дальше — старшая
+    m = re.search(r"\d+", class_name)
+    if m is None or int(m.group()) <= 4:
+        return "primary"
+    return "secondary"
+
+
+@lru_cache(maxsize=32)
+def _compile(columns: Tuple[str, ...], config_items: Tuple[Tuple[str, Tuple[Tuple[str, str], ...]], ...]) -> ExtractionPlan:
+    pos = {c: i for i, c in reversed(list(enumerate(columns)))}  # при дублях — первая колонка
+    class_configs = {name: dict(items) for name, items in config_items}
+    missing: List[str] = []
+
+    def find(col: str) -> Optional[int]:
+        if col not in pos:
+            missing.append(col)
+            return None
+        return pos[col]
+
+    day = find(DAY_COLUMN)
+    timeslots = {level: tuple(find(c) for c in cols) for level, cols in TIMESLOT_COLUMNS.items()}
+
+    # Блоки классов в порядке заголовка
+    found: Dict[str, Dict[str, int]] = {}
+    for i, col in enumerate(columns):
+        m = CLASS_COLUMN_RE.match(col)
+        if m:
+            found.setdefault(m.group("cls"), {}).setdefault(PART_KEYS[m.group("part")], i)
+
+    blocks: List[ClassBlock] = []
+    # Классы из настроек — по их названиям колонок (и в их порядке), как и раньше
+    for name, cfg in class_configs.items():
+        blocks.append(ClassBlock(
+            name=name,
+            level=cfg["level"],
+            subject=find(cfg["subject_col"]),
+            teacher=find(cfg["teacher_col"]),
+            tutor=find(cfg["tutor_col"]),
+            room=find(cfg["room_col"]),
+        ))
+
+    discovered: List[str] = []
+    if DISCOVER_CLASSES:
+        configured_cols = {cfg[k] for cfg in class_configs.values()
+                           for k in ("subject_col", "teacher_col", "tutor_col", "room_col")}
+        for name, parts in found.items():
+            if name in class_configs or "subject" not in parts:
+                continue
+            if any(columns[i] in configured_cols for i in parts.values()):
+                continue
+            discovered.append(name)
+            for part, label in (("teacher", "Педагог"), ("tutor", "Тьютор"), ("room", "Комната")):
+                if part not in parts:
+                    missing.append(f"{name} {label}")
+            blocks.append(ClassBlock(
+                name=name,
+                level=infer_level(name),
+                subject=parts["subject"],
+                teacher=parts.get("teacher"),
+                tutor=parts.get("tutor"),
+                room=parts.get("room"),
+            ))
+
+    return ExtractionPlan(
+        day=day,
+        timeslots=timeslots,
+        classes=tuple(blocks),
+        missing_columns=tuple(missing),
+        discovered_classes=tuple(discovered),
+        columns=columns,
+    )
+
+
+def compile_plan(columns: List[str], class_configs: Dict[str, Dict[str, str]] = CLASS_CONFIGS) -> ExtractionPlan:
+    """
+    План извлечения для заголовка columns: кэшируется по (заголовок, настройки классов),
+    поэтому повторные загрузки той же раскладки ничего не пересчитывают.
+    """
+    config_items = tuple((name, tuple(sorted(cfg.items()))) for name, cfg in class_configs.items())
+    return _compile(tuple(str(c) for c in columns), config_items)
+
+
+# Последняя раскладка по каждому источнику — чтобы сообщить, если заголовок таблицы поменялся
+_last_layouts: Dict[str, Dict[str, Any]] = {}
+
+
+def layout_changes(source_key: str, cur: Dict[str, Any]) -> List[str]:
+    """
+    Что поменялось в раскладке заголовка (ExtractionPlan.layout()) источника
+    с прошлой сборки расписания (пусто при первой и если ничего не поменялось).
+    """
+    prev = _last_layouts.get(source_key)
+    _last_layouts[source_key] = cur
+    if prev is None or prev == cur:
+        return []
+
+    changes: List[str] = []
+    added = [c for c in cur["classes"] if c not in prev["classes"]]
+    removed = [c for c in prev["classes"] if c not in cur["classes"]]
+    if added:
+        changes.append("Новые классы: " + ", ".join(added))
+    if removed:
+        changes.append("Пропали классы: " + ", ".join(removed))
+    new_cols = [c for c in cur["columns"] if c not in prev["columns"]]
+    gone_cols = [c for c in prev["columns"] if c not in cur["columns"]]
+    if new_cols:
+        changes.append("Новые колонки: " + ", ".join(new_cols))
+    if gone_cols:
+        changes.append("Пропали колонки: " + ", ".join(gone_cols))
+    if not new_cols and not gone_cols and prev["columns"] != cur["columns"]:
+        changes.append("Изменился порядок колонок")
+    return changes
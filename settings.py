@@ -14,9 +14,48 @@ REMOTE_XLSX_URL = (
     "https://docs.google.com/spreadsheets/d/e/2PACX-1vSq2NeYnCuzHMDOezQKC5z4qkox9cuGFzxz1sZS7MkVw31Y0Z8Xm2xcKYUCM6_2sFFD75dadertqbZI/pub?output=xlsx"
 )
 
+# Замены/отмены на конкретные даты (накладываются поверх недельного расписания).
+# Пустая строка — источник не используется. Если заданы оба, берется локальный файл.
+# Колонки CSV: Дата; Номер урока; Класс; Группа; Действие (замена/отмена/добавить);
+#              Предмет; Педагог; Тьютор; Комната; Начало; Конец; Комментарий
+# Класс пишется как в расписании (при нескольких кампусах — с префиксом: "Север: 5 класс").
+OVERLAY_CSV_PATH = ""
+# Например, второй лист той же Google-таблицы: .../pub?gid=<id листа>&single=true&output=csv
+OVERLAY_CSV_URL = ""
+# Как часто перечитывать замены по ссылке (секунды)
+OVERLAY_REFRESH_SECONDS = 60
+
+# JSON API для киосков/мобильной страницы (python api.py)
+API_HOST = "127.0.0.1"
+API_PORT = 8502
+
+# Имена педагогов/тьюторов/кабинетов, записанные по-разному.
+# Ручные псевдонимы: вариант -> каноническое имя (учитываются при поиске конфликтов).
+NAME_ALIASES = {
+    # "Иванова А.А.": "Иванова А.",
+}
+# Автоматически склеивать варианты с высокой уверенностью
+# (регистр, латиница вместо кириллицы, "Иванова А." ~ "Иванова А.А.")
+NAME_AUTO_MERGE = True
+
+# История версий расписания (каталог и сколько последних версий хранить)
+HISTORY_DIR = "history"
+HISTORY_MAX_VERSIONS = 60
+
 # Авто-обновление (секунды)
 REFRESH_EVERY_SECONDS = 600  # 10 минут
 
+# Локальные xlsx (excel_local и кампусы SOURCES с mode "excel_local"): перечитывать файл сразу
+# после сохранения, а не по таймеру. Источники-ссылки по-прежнему обновляются раз в REFRESH_EVERY_SECONDS.
+LOCAL_WATCH = True
+# Сколько секунд файл должен не меняться, чтобы считать сохранение завершенным
+LOCAL_WATCH_DEBOUNCE_SECONDS = 1.5
+# Интервал опроса, если уведомления файловой системы недоступны
+LOCAL_WATCH_POLL_SECONDS = 2.0
+
+# Часовой пояс школы (для вкладки «Сейчас»)
+TIMEZONE = "Europe/Moscow"
+
 
 WEEKDAY_MAP = {
     "ПНД": "Понедельник",
@@ -38,3 +77,19 @@ CLASS_CONFIGS = {
     "8 класс": {"level": "secondary", "subject_col": "8 класс Урок", "teacher_col": "8 класс Педагог", "tutor_col": "8 класс Тьютор", "room_col": "8 класс Комната"},
     "9 класс": {"level": "secondary", "subject_col": "9 класс Урок", "teacher_col": "9 класс Педагог", "tutor_col": "9 класс Тьютор", "room_col": "9 класс Комната"},
 }
+
+# Брать из заголовка таблицы и классы, которых нет в CLASS_CONFIGS (колонки "<класс> Урок/Педагог/Тьютор/Комната").
+# Уровень таких классов: 1–4 и классы без номера — началка, остальные — старшая.
+DISCOVER_CLASSES = True
+
+# Несколько кампусов/таблиц, сводимых в одно расписание (конфликты ищутся по всем сразу:
+# один педагог может работать в двух кампусах). Пустой список — одна таблица из настроек выше.
+# Поля: campus — название (добавляется к классам и кабинетам: "Север: 5 класс"),
+#       mode — "excel_url" / "excel_local", url или path, sheet, class_configs (по умолчанию CLASS_CONFIGS)
+SOURCES = [
+    # {"campus": "Север", "mode": "excel_url", "url": REMOTE_XLSX_URL, "sheet": XLSX_SHEET_NAME},
+    # {"campus": "Юг", "mode": "excel_local", "path": r"D:\Schedule_mom\Юг.xlsx", "sheet": "Расписание",
+    #  "class_configs": {...}},
+]
+# Сколько таблиц скачивать/разбирать одновременно
+SOURCES_MAX_WORKERS = 4
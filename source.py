@@ -1,13 +1,19 @@
 # source.py
+import hashlib
 import io
 import os
 import time as _time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
 import requests
 import pandas as pd
 
-from settings import DATA_MODE, LOCAL_XLSX_PATH, XLSX_SHEET_NAME, REMOTE_XLSX_URL
+from settings import (
+    DATA_MODE, LOCAL_XLSX_PATH, XLSX_SHEET_NAME, REMOTE_XLSX_URL,
+    OVERLAY_CSV_PATH, OVERLAY_CSV_URL, SOURCES, CLASS_CONFIGS,
+)
 from utils import normalize_columns
 
 
@@ -23,9 +29,9 @@ def _add_cache_buster(url: str) -> str:
     return urlunparse(parsed._replace(query=new_query))
 
 
-def download_xlsx_bytes(url: str) -> io.BytesIO:
+def download_bytes(url: str) -> io.BytesIO:
     """
-    Скачивает xlsx по URL и возвращает BytesIO.
+    Скачивает файл (xlsx/csv) по URL и возвращает BytesIO.
     Используем cache-buster и no-cache заголовки, чтобы изменения приходили с первого обновления.
     """
     url = _add_cache_buster(url)
@@ -40,6 +46,10 @@ def download_xlsx_bytes(url: str) -> io.BytesIO:
     return io.BytesIO(resp.content)
 
 
+def download_xlsx_bytes(url: str) -> io.BytesIO:
+    return download_bytes(url)
+
+
 def load_raw_table() -> pd.DataFrame:
     """
     Возвращает "сырую" таблицу из источника (XLSX).
@@ -59,3 +69,111 @@ def load_raw_table() -> pd.DataFrame:
         raise ValueError("DATA_MODE должен быть 'excel_local' или 'excel_url'.")
 
     return normalize_columns(df)
+
+
+
+# =========================
+# НЕСКОЛЬКО ИСТОЧНИКОВ (кампусы)
+# =========================
+@dataclass(frozen=True)
+class SourceSpec:
+    campus: str
+    mode: str                 # "excel_local" / "excel_url"
+    location: str             # путь или URL
+    sheet: str
+    class_configs: Dict[str, Dict[str, str]] = field(default_factory=dict, compare=False, hash=False)
+
+
+def configured_sources() -> List[SourceSpec]:
+    """Источники из SOURCES; если список пуст — одна таблица из DATA_MODE/LOCAL_XLSX_PATH/REMOTE_XLSX_URL."""
+    if not SOURCES:
+        location = LOCAL_XLSX_PATH if DATA_MODE == "excel_local" else REMOTE_XLSX_URL
+        return [SourceSpec("", DATA_MODE, location, XLSX_SHEET_NAME, CLASS_CONFIGS)]
+
+    specs = []
+    for cfg in SOURCES:
+        mode = cfg.get("mode", "excel_url")
+        specs.append(SourceSpec(
+            campus=cfg["campus"],
+            mode=mode,
+            location=cfg.get("path", "") if mode == "excel_local" else cfg.get("url", ""),
+            sheet=cfg.get("sheet", XLSX_SHEET_NAME),
+            class_configs=cfg.get("class_configs", CLASS_CONFIGS),
+        ))
+    return specs
+
+
+def qualify(campus: str, name: str) -> str:
+    # "Север" + "5 класс" -> "Север: 5 класс"; без кампуса и для пустых значений — как есть
+    return f"{campus}: {name}" if campus and name else name
+
+
+def class_levels() -> Dict[str, Tuple[str, str]]:
+    """Все известные классы (с кампусом, если их несколько) -> (кампус, уровень primary/secondary)."""
+    specs = configured_sources()
+    multi = bool(SOURCES)
+    return {
+        qualify(spec.campus if multi else "", class_name): (spec.campus, cfg["level"])
+        for spec in specs
+        for class_name, cfg in spec.class_configs.items()
+    }
+
+
+def fetch_source(spec: SourceSpec) -> Tuple[str, Optional[bytes]]:
+    """
+    Отпечаток источника + содержимое (если его пришлось получить ради отпечатка).
+    Локальный файл: (mtime, размер, inode) — без чтения файла; ссылка: скачиваем и берем sha1.
+    """
+    if spec.mode == "excel_local":
+        if not os.path.exists(spec.location):
+            raise FileNotFoundError(f"Локальный файл не найден: {spec.location}")
+        st_ = os.stat(spec.location)
+        return f"{st_.st_mtime_ns}-{st_.st_size}-{st_.st_ino}", None
+
+    if spec.mode == "excel_url":
+        if "PASTE_GOOGLE_EXPORT_XLSX_URL_HERE" in spec.location:
+            raise ValueError("Вставь реальный URL источника.")
+        content = download_bytes(spec.location).getvalue()
+        return hashlib.sha1(content).hexdigest(), content
+
+    raise ValueError("mode источника должен быть 'excel_local' или 'excel_url'.")
+
+
+def read_source_table(spec: SourceSpec, content: Optional[bytes]) -> pd.DataFrame:
+    src = io.BytesIO(content) if content is not None else spec.location
+    df = pd.read_excel(src, sheet_name=spec.sheet)
+    return normalize_columns(df)
+
+
+def has_overlay_source() -> bool:
+    return bool(OVERLAY_CSV_PATH or OVERLAY_CSV_URL)
+
+
+def overlay_local_mtime() -> Optional[int]:
+    """
+    mtime локального файла замен (ns) — ключ кэша: файл перечитывается только после сохранения.
+    None — локальный файл не задан (замены по ссылке); если задан, но его нет — FileNotFoundError.
+    """
+    if not OVERLAY_CSV_PATH:
+        return None
+    if not os.path.exists(OVERLAY_CSV_PATH):
+        raise FileNotFoundError(f"Файл замен не найден: {OVERLAY_CSV_PATH}")
+    return os.stat(OVERLAY_CSV_PATH).st_mtime_ns
+
+
+def load_overlay_table() -> pd.DataFrame:
+    """
+    Возвращает "сырую" таблицу замен (CSV): локальный файл или ссылка.
+    Разделитель (, или ;) определяется автоматически. Все значения читаем как строки.
+    """
+    if OVERLAY_CSV_PATH:
+        if not os.path.exists(OVERLAY_CSV_PATH):
+            raise FileNotFoundError(f"Файл замен не найден: {OVERLAY_CSV_PATH}")
+        src = OVERLAY_CSV_PATH
+    elif OVERLAY_CSV_URL:
+        src = download_bytes(OVERLAY_CSV_URL)
+    else:
+        return pd.DataFrame()
+
+    df = pd.read_csv(src, sep=None, engine="python", dtype=str, keep_default_na=False, encoding="utf-8-sig")
+    return normalize_columns(df)
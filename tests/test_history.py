@@ -0,0 +1,58 @@
+# tests/test_history.py
+from datetime import time
+
+import numpy as np
+import pandas as pd
+
+import history
+from history import SnapshotHistory, _multiset_diff, diff_versions
+
+
+def _lesson(num: int, subject: str) -> dict:
+    return {
+        "День недели": "Понедельник", "Номер урока": num, "Начало": time(9 + num, 0), "Конец": time(9 + num, 40),
+        "Класс": "5 класс", "Группа": "", "Предмет": subject, "Педагог": "Иванова А.", "Тьютор": "", "Комната": "7",
+    }
+
+
+def test_multiset_diff_keeps_duplicates():
+    a = np.array([1, 1, 2, 3], dtype=np.uint64)
+    b = np.array([1, 3, 3, 4], dtype=np.uint64)
+    assert sorted(_multiset_diff(a, b).tolist()) == [1, 2]
+    assert sorted(_multiset_diff(b, a).tolist()) == [3, 4]
+    assert sorted(_multiset_diff(a, np.array([], dtype=np.uint64)).tolist()) == [1, 1, 2, 3]
+
+
+def test_diff_reports_duplicated_row(tmp_path):
+    history = SnapshotHistory(str(tmp_path), max_versions=5)
+    df = pd.DataFrame([_lesson(1, "Алгебра"), _lesson(2, "История")])
+    doubled = pd.concat([df, df.iloc[[0]]], ignore_index=True)
+    history.record(df, "v1")
+    history.record(doubled, "v2")
+
+    diff = diff_versions(history, 1, 2)
+    assert list(diff["Изменение"]) == ["добавлено"]
+    assert "Алгебра" in diff.iloc[0]["Стало"]
+
+    back = diff_versions(history, 2, 1)
+    assert list(back["Изменение"]) == ["удалено"]
+
+
+def test_return_to_previous_snapshot_is_recorded(tmp_path, monkeypatch):
+    monkeypatch.setattr(history, "HISTORY_DIR", str(tmp_path))
+    history.get_history.clear()
+    history._last_recorded.clear()
+
+    a = pd.DataFrame([_lesson(1, "Алгебра"), _lesson(2, "История")])
+    b = pd.DataFrame([_lesson(1, "Алгебра"), _lesson(2, "Физика")])
+    for df, fingerprint in ((a, "A"), (a, "A"), (b, "B"), (a, "A")):
+        history.record_snapshot(df, fingerprint)
+
+    versions = history.get_history().versions()
+    assert [v["fingerprint"] for v in versions] == ["A", "B", "A"]
+    diff = history.diff_versions(history.get_history(), 2, 3)
+    assert list(diff["Изменение"]) == ["изменено"]
+    assert "История" in diff.iloc[0]["Стало"]
+
+    history.get_history.clear()
+    history._last_recorded.clear()
@@ -0,0 +1,69 @@
+# tests/test_names.py
+from collections import Counter
+
+import pandas as pd
+
+from names import _person_aliases, analyze_names, find_person_duplicates, fold_room
+
+# Три написания одного человека: с инициалом, с двумя, фамилия с латинской "a"
+SPELLINGS = ["Иванова А.", "Иванова А.А.", "Ивановa"]
+
+
+def _pairs(found):
+    return {frozenset((r["Имя 1"], r["Имя 2"])): r["Уверенность"] for r in found}
+
+
+def test_three_spellings_are_high_confidence_duplicates():
+    pairs = _pairs(find_person_duplicates(SPELLINGS))
+    assert set(pairs) == {frozenset(p) for p in [
+        ("Иванова А.", "Иванова А.А."), ("Иванова А.", "Ивановa"), ("Иванова А.А.", "Ивановa"),
+    ]}
+    assert set(pairs.values()) == {"высокая"}
+
+
+def test_surname_typo_is_medium_confidence_only_with_initials():
+    pairs = _pairs(find_person_duplicates(["Смирнова А.", "Смирнава А.", "Смирнава"]))
+    assert pairs[frozenset(("Смирнова А.", "Смирнава А."))] == "средняя"
+    # без инициалов опечатку в фамилии не предлагаем
+    assert frozenset(("Смирнова А.", "Смирнава")) not in pairs
+
+
+def test_short_surnames_are_not_compared_fuzzily():
+    assert find_person_duplicates(["Ким А.", "Кимм А."]) == []
+
+
+def test_person_aliases_merge_three_spellings_into_most_frequent():
+    aliases = _person_aliases(Counter({"Иванова А.": 5, "Иванова А.А.": 2, "Ивановa": 1}))
+    assert aliases == {"иванова а.а.": "Иванова А.", "ивановa": "Иванова А."}
+
+
+def test_person_aliases_skip_ambiguous_initials():
+    # "Иванова" может быть и "Иванова А.", и "Иванова Б." — склеиваем только одинаковые после приведения
+    aliases = _person_aliases(Counter({"Иванова А.": 5, "Иванова Б.": 2, "Иванова": 1, "Ивaнова А.": 1}))
+    assert aliases == {"ивaнова а.": "Иванова А."}
+
+
+def test_fold_room():
+    assert fold_room("Каб. 12") == fold_room("кабинет №12") == fold_room("12") == "12"
+    assert fold_room("12 а") == fold_room("12а")
+    assert fold_room("1.2") == "1.2"
+    assert fold_room("1.2") != fold_room("12")
+    assert fold_room("1 2") != fold_room("12")
+
+
+def test_dotted_room_number_is_not_merged():
+    df = pd.DataFrame({
+        "Педагог": [""] * 3, "Тьютор": [""] * 3,
+        "Комната": ["Каб. 12", "1.2", "12"],
+    })
+    duplicates, aliases = analyze_names(df)
+    assert aliases == {"12": "Каб. 12"}
+    assert list(zip(duplicates["Имя 1"], duplicates["Имя 2"], duplicates["Склеено"])) == [("12", "Каб. 12", "да")]
+
+
+def test_unmerged_pairs_are_marked():
+    names = ["Иванова А.", "Иванова Б.", "Иванова"]
+    df = pd.DataFrame({"Педагог": names, "Тьютор": [""] * 3, "Комната": [""] * 3})
+    duplicates, _ = analyze_names(df)
+    assert not duplicates.empty
+    assert set(duplicates["Склеено"]) == {"нет"}
@@ -0,0 +1,177 @@
+# tests/test_overlay.py
+import random
+from datetime import date, time, timedelta
+
+import pandas as pd
+import pytest
+
+from conflicts import detect_conflicts, detect_conflicts_incremental
+from names import analyze_names
+from overlay import ACTION_ADD, ACTION_CANCEL, ACTION_REPLACE, DAY_NAMES, OverlayChange, apply_overlay
+
+WEEK = date(2026, 10, 19)  # понедельник
+CLASSES = ["5 класс", "6 класс", "7 класс", "8 класс", "9 класс"]
+# "Иванова А." с латинской "a" — склеивается с кириллической через aliases
+TEACHERS = ["Иванова А.", "Ивaнова А.", "Петров Б.", "Сидорова В.", "Орлова Д.", "Кузнецов Е."]
+ROOMS = ["1", "2", "Каб. 3", "3", "4"]
+
+
+def _slot(num: int) -> tuple:
+    start = 9 * 60 + (num - 1) * 50
+    return time(start // 60, start % 60), time((start + 40) // 60, (start + 40) % 60)
+
+
+def _lesson(day: str, num: int, class_name: str, group: str, rnd: random.Random) -> dict:
+    start, end = _slot(num)
+    if rnd.random() < 0.1:  # урок со сдвигом — частичные пересечения
+        start = time(start.hour, start.minute + 5)
+    return {
+        "День недели": day, "Номер урока": num, "Начало": start, "Конец": end,
+        "Класс": class_name, "Группа": group,
+        "Предмет": rnd.choice(["Алгебра", "История", "Физика", "Химия"]),
+        "Педагог": rnd.choice(TEACHERS),
+        "Тьютор": rnd.choice(["", "", "Сидорова В.", "Морозова Ж."]),
+        "Комната": rnd.choice(ROOMS),
+    }
+
+
+def _random_schedule(rnd: random.Random) -> pd.DataFrame:
+    rows = []
+    for day in DAY_NAMES[:3]:
+        for num in range(1, 5):
+            for class_name in CLASSES:
+                groups = ["A", "B"] if rnd.random() < 0.3 else [""]
+                rows += [_lesson(day, num, class_name, g, rnd) for g in groups]
+    return pd.DataFrame(rows)
+
+
+def _change(line: int, row_day: str, num: int, class_name: str, action: str, group: str = "",
+            values: tuple = (), start=None, end=None) -> OverlayChange:
+    return OverlayChange(
+        line=line, date=WEEK + timedelta(days=DAY_NAMES.index(row_day)), day=row_day, num=num,
+        class_name=class_name, group=group, action=action, values=values, start=start, end=end, comment="",
+    )
+
+
+def _random_changes(df: pd.DataFrame, rnd: random.Random) -> list:
+    changes = []
+    for line in range(2, 2 + rnd.randint(1, 6)):
+        r = df.iloc[rnd.randrange(len(df))]
+        kind = rnd.choice([ACTION_REPLACE, ACTION_CANCEL, ACTION_ADD])
+        if kind == ACTION_REPLACE:
+            values = (("Педагог", rnd.choice(TEACHERS)), ("Комната", rnd.choice(ROOMS)))
+            changes.append(_change(line, r["День недели"], r["Номер урока"], r["Класс"], kind, values=values))
+        elif kind == ACTION_CANCEL:
+            changes.append(_change(line, r["День недели"], r["Номер урока"], r["Класс"], kind, group=r["Группа"]))
+        else:
+            start, end = _slot(r["Номер урока"])
+            values = (("Предмет", "Кружок"), ("Педагог", rnd.choice(TEACHERS)), ("Комната", rnd.choice(ROOMS)))
+            changes.append(_change(line, r["День недели"], 7, r["Класс"], kind, values=values, start=start, end=end))
+    return changes
+
+
+def _normalized(conflicts_df: pd.DataFrame) -> pd.DataFrame:
+    if conflicts_df.empty:
+        return pd.DataFrame()
+    out = conflicts_df.astype(str)
+    return out.sort_values(list(out.columns)).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_incremental_conflicts_match_full_recompute(seed):
+    rnd = random.Random(seed)
+    df = _random_schedule(rnd)
+    _, aliases = analyze_names(df)
+    base_conflicts, _ = detect_conflicts(df, aliases)
+
+    patched, affected, meta = apply_overlay(df, _random_changes(df, rnd), WEEK, aliases)
+    incremental, _ = detect_conflicts_incremental(base_conflicts, patched, affected, aliases)
+    full, _ = detect_conflicts(patched, aliases)
+
+    assert meta["applied"] > 0
+    pd.testing.assert_frame_equal(_normalized(incremental), _normalized(full))
+
+
+def _fixed_schedule() -> pd.DataFrame:
+    rnd = random.Random(0)
+    rows = [
+        _lesson("Понедельник", 1, "5 класс", "A", rnd),
+        _lesson("Понедельник", 1, "5 класс", "B", rnd),
+        _lesson("Понедельник", 2, "5 класс", "", rnd),
+        _lesson("Понедельник", 1, "6 класс", "", rnd),
+    ]
+    return pd.DataFrame(rows)
+
+
+def test_cancel_removes_only_matching_group():
+    df = _fixed_schedule()
+    changes = [_change(2, "Понедельник", 1, "5 класс", ACTION_CANCEL, group="A")]
+    patched, _, meta = apply_overlay(df, changes, WEEK)
+
+    assert meta == {"applied": 1, "unmatched": []}
+    left = patched[(patched["Класс"] == "5 класс") & (patched["Номер урока"] == 1)]
+    assert list(left["Группа"]) == ["B"]
+    assert len(patched) == len(df) - 1
+
+
+def test_cancel_whole_class_slot():
+    df = _fixed_schedule()
+    patched, _, meta = apply_overlay(df, [_change(2, "Понедельник", 1, "5 класс", ACTION_CANCEL)], WEEK)
+
+    assert meta["applied"] == 1
+    assert not ((patched["Класс"] == "5 класс") & (patched["Номер урока"] == 1)).any()
+
+
+def test_unmatched_changes_are_reported():
+    df = _fixed_schedule()
+    changes = [
+        _change(2, "Понедельник", 5, "5 класс", ACTION_CANCEL),            # отменять нечего
+        _change(3, "Вторник", 1, "5 класс", ACTION_REPLACE,                # слота нет, предмета в замене нет
+                values=(("Педагог", "Петров Б."),)),
+        _change(4, "Среда", 3, "5 класс", ACTION_ADD,                      # нет времени и не у кого его взять
+                values=(("Предмет", "Кружок"),)),
+    ]
+    patched, affected, meta = apply_overlay(df, changes, WEEK)
+
+    assert meta == {"applied": 0, "unmatched": [2, 3, 4]}
+    assert not affected
+    assert len(patched) == len(df)
+
+
+def test_unmatched_replacement_does_not_add_lesson():
+    df = _fixed_schedule()
+    changes = [
+        _change(2, "Понедельник", 9, "5 класс", ACTION_REPLACE,                # нет такого урока
+                values=(("Предмет", "Кружок"), ("Педагог", "Петров Б.")),
+                start=time(9, 0), end=time(9, 40)),
+        _change(3, "Понедельник", 1, "7 класс", ACTION_REPLACE,                # у класса нет урока в этом слоте
+                values=(("Предмет", "Кружок"),)),
+    ]
+    patched, affected, meta = apply_overlay(df, changes, WEEK)
+
+    assert meta == {"applied": 0, "unmatched": [2, 3]}
+    assert not affected
+    assert len(patched) == len(df)
+    assert "Кружок" not in set(patched["Предмет"])
+
+
+def test_changes_outside_week_are_ignored():
+    df = _fixed_schedule()
+    change = _change(2, "Понедельник", 1, "5 класс", ACTION_CANCEL)
+    next_week = OverlayChange(**{**change.__dict__, "date": WEEK + timedelta(days=7)})
+    patched, affected, meta = apply_overlay(df, [next_week], WEEK)
+
+    assert patched is df
+    assert not affected and meta == {"applied": 0, "unmatched": []}
+
+
+def test_add_takes_time_from_same_level_class():
+    df = _fixed_schedule()
+    change = _change(2, "Понедельник", 1, "7 класс", ACTION_ADD, values=(("Предмет", "Кружок"),))
+    patched, _, meta = apply_overlay(df, [change], WEEK)
+
+    assert meta["applied"] == 1
+    added = patched[patched["Класс"] == "7 класс"].iloc[0]
+    ref = df[(df["Класс"] == "6 класс") & (df["Номер урока"] == 1)].iloc[0]
+    assert (added["Начало"], added["Конец"]) == (ref["Начало"], ref["Конец"])
+    assert added["Изменение"] == "добавлено"
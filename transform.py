@@ -1,40 +1,30 @@
 # transform.py
+import hashlib
+import time as _time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 
 import pandas as pd
 import streamlit as st
 
-from settings import REFRESH_EVERY_SECONDS, WEEKDAY_MAP, CLASS_CONFIGS
-from source import load_raw_table
+from settings import (
+    LOCAL_WATCH, REFRESH_EVERY_SECONDS, WEEKDAY_MAP, CLASS_CONFIGS,
+    SOURCES, SOURCES_MAX_WORKERS,
+)
+from source import SourceSpec, load_raw_table, configured_sources, fetch_source, read_source_table, qualify
+from schema import compile_plan, layout_changes
 from utils import safe_str, to_time
 from groups import parse_grouped_field, collect_groups, value_for_group
+from watch import FileWatcher, get_watcher
 
 
-def detect_missing_columns(df: pd.DataFrame) -> list[str]:
-    required = [
-        "ДН",
-        "Тип началка", "Тип старшая",
-        "Начало началка", "Конец началка",
-        "Начало старшая", "Конец старшая",
-        "Номер слота", "Номер старшая"
-    ]
-    for cfg in CLASS_CONFIGS.values():
-        required += [cfg["subject_col"], cfg["teacher_col"], cfg["tutor_col"], cfg["room_col"]]
-    return [c for c in required if c not in df.columns]
-
-
-def get_timeslot(row: pd.Series, level: str) -> Tuple[Optional[int], Optional[object], Optional[object], Optional[str]]:
-    if level == "primary":
-        lesson_type = safe_str(row.get("Тип началка")).lower() or None
-        num = row.get("Номер слота")
-        start = to_time(row.get("Начало началка"))
-        end = to_time(row.get("Конец началка"))
-    else:
-        lesson_type = safe_str(row.get("Тип старшая")).lower() or None
-        num = row.get("Номер старшая")
-        start = to_time(row.get("Начало старшая"))
-        end = to_time(row.get("Конец старшая"))
+def get_timeslot(values: Sequence[Any], positions: Tuple[Optional[int], ...]) -> Tuple[Optional[int], Optional[object], Optional[object], Optional[str]]:
+    # positions — (тип, номер, начало, конец) из плана извлечения; None = колонки нет
+    raw_type, num, raw_start, raw_end = (values[i] if i is not None else None for i in positions)
+    lesson_type = safe_str(raw_type).lower() or None
+    start = to_time(raw_start)
+    end = to_time(raw_end)
 
     try:
         num_int = int(float(num)) if num is not None and str(num).strip() != "" else None
@@ -44,42 +34,75 @@ def get_timeslot(row: pd.Series, level: str) -> Tuple[Optional[int], Optional[ob
     return num_int, start, end, lesson_type
 
 
-@st.cache_data(ttl=REFRESH_EVERY_SECONDS)
-def load_and_process_data() -> Tuple[pd.DataFrame, Dict[str, Any]]:
+def _sort_schedule(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        return df
+    day_order = {"Понедельник": 1, "Вторник": 2, "Среда": 3, "Четверг": 4, "Пятница": 5}
+    df["__day_order"] = df["День недели"].map(day_order).fillna(99).astype(int)
+    return df.sort_values(["__day_order", "Номер урока", "Класс", "Группа"]).drop(columns="__day_order")
+
+
+def snapshot_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Отпечаток обработанного расписания: одинаковые данные -> одинаковая строка.
+    Используем как ключ для производных структур (индексы, матрицы и т.п.),
+    чтобы пересобирать их только когда расписание реально изменилось.
+    """
+    if df.empty:
+        return "empty"
+    row_hashes = pd.util.hash_pandas_object(df, index=False).values
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()[:16]
+
+
+def process_table(
+    df_raw: pd.DataFrame,
+    class_configs: Dict[str, Dict[str, str]] = CLASS_CONFIGS,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
     meta: Dict[str, Any] = {"warnings": [], "missing_columns": []}
 
-    df_raw = load_raw_table()
     meta["raw_shape"] = df_raw.shape
     meta["raw_columns"] = df_raw.columns.tolist()
 
-    missing = detect_missing_columns(df_raw)
-    meta["missing_columns"] = missing
-    if missing:
+    # Позиции колонок считаются один раз на раскладку заголовка (schema.compile_plan)
+    plan = compile_plan(meta["raw_columns"], class_configs)
+    meta["missing_columns"] = list(plan.missing_columns)
+    meta["discovered_classes"] = list(plan.discovered_classes)
+    # класс -> (кампус, уровень): и из настроек, и найденные по заголовку (кампус добавляет process_sources)
+    meta["class_levels"] = {block.name: ("", block.level) for block in plan.classes}
+    # раскладку сравниваем с прошлой загрузкой уже при сборке результата (process_raw_table / process_sources):
+    # meta отдельного источника кэшируется и не должна повторять одно и то же предупреждение
+    meta["layout"] = plan.layout()
+    if plan.missing_columns:
         meta["warnings"].append(
             "В таблице не найдены некоторые ожидаемые колонки. Часть данных может не отобразиться корректно."
         )
 
     processed_rows = []
 
-    for _, row in df_raw.iterrows():
-        day_abbr = safe_str(row.get("ДН"))
+    def cell(values: Sequence[Any], i: Optional[int]) -> Any:
+        return values[i] if i is not None else None
+
+    for values in df_raw.to_numpy(dtype=object):
+        day_abbr = safe_str(cell(values, plan.day))
         if day_abbr == "":
             continue
 
         day_full = WEEKDAY_MAP.get(day_abbr, day_abbr)
+        # сетка звонков одна на уровень — разбираем один раз на строку, а не на каждый класс
+        timeslots = {level: get_timeslot(values, positions) for level, positions in plan.timeslots.items()}
 
-        for class_name, cfg in CLASS_CONFIGS.items():
-            num, start, end, lesson_type = get_timeslot(row, cfg["level"])
+        for block in plan.classes:
+            num, start, end, lesson_type = timeslots[block.level]
             if lesson_type != "урок":
                 continue
 
-            subject_map = parse_grouped_field(row.get(cfg["subject_col"]))
+            subject_map = parse_grouped_field(cell(values, block.subject))
             if not subject_map:
                 continue
 
-            teacher_map = parse_grouped_field(row.get(cfg["teacher_col"]))
-            tutor_map = parse_grouped_field(row.get(cfg["tutor_col"]))
-            room_map = parse_grouped_field(row.get(cfg["room_col"]))
+            teacher_map = parse_grouped_field(cell(values, block.teacher))
+            tutor_map = parse_grouped_field(cell(values, block.tutor))
+            room_map = parse_grouped_field(cell(values, block.room))
 
             groups = collect_groups(subject_map, teacher_map, tutor_map, room_map)
 
@@ -93,7 +116,7 @@ def load_and_process_data() -> Tuple[pd.DataFrame, Dict[str, Any]]:
                     "Номер урока": num,
                     "Начало": start,
                     "Конец": end,
-                    "Класс": class_name,
+                    "Класс": block.name,
                     "Группа": "" if grp == "All" else grp,
                     "Предмет": subject,
                     "Педагог": value_for_group(teacher_map, grp).strip(),
@@ -103,12 +126,172 @@ def load_and_process_data() -> Tuple[pd.DataFrame, Dict[str, Any]]:
 
     result_df = pd.DataFrame(processed_rows)
 
-    if not result_df.empty:
-        day_order = {"Понедельник": 1, "Вторник": 2, "Среда": 3, "Четверг": 4, "Пятница": 5}
-        result_df["__day_order"] = result_df["День недели"].map(day_order).fillna(99).astype(int)
-        result_df = result_df.sort_values(["__day_order", "Номер урока", "Класс", "Группа"]).drop(columns="__day_order")
+    result_df = _sort_schedule(result_df)
 
     meta["processed_shape"] = result_df.shape
+    meta["fingerprint"] = snapshot_fingerprint(result_df)
     meta["last_loaded_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     return result_df, meta
+
+
+def _layout_warning(changes: List[str]) -> str:
+    return "Изменилась раскладка колонок таблицы: " + "; ".join(changes)
+
+
+def process_raw_table() -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    df, meta = process_table(load_raw_table())
+    meta["layout_changes"] = layout_changes("", meta["layout"])
+    if meta["layout_changes"]:
+        meta["warnings"].append(_layout_warning(meta["layout_changes"]))
+    return df, meta
+
+
+# =========================
+# НЕСКОЛЬКО ИСТОЧНИКОВ (SOURCES)
+# =========================
+@st.cache_resource
+def _source_cache() -> Dict[str, Tuple[str, pd.DataFrame, Dict[str, Any]]]:
+    # кампус -> (отпечаток источника, обработанная таблица, meta); живет дольше cache_data,
+    # поэтому кнопка «Обновить» не заставляет заново разбирать неизменившиеся таблицы
+    return {}
+
+
+def _load_source(
+    spec: SourceSpec,
+    cache: Dict[str, Tuple[str, pd.DataFrame, Dict[str, Any]]],
+) -> Tuple[pd.DataFrame, Dict[str, Any], bool]:
+    fingerprint, content = fetch_source(spec)
+    cached = cache.get(spec.campus)
+    if cached is not None and cached[0] == fingerprint:
+        return cached[1], cached[2], False
+
+    df, meta = process_table(read_source_table(spec, content), spec.class_configs)
+    cache[spec.campus] = (fingerprint, df, meta)
+    return df, meta, True
+
+
+def process_sources() -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Загружает все источники параллельно (скачивание и разбор в пуле потоков), у каждого — свой
+    кэш по отпечатку: разбирается заново только изменившаяся таблица. Затем склеивает в одно
+    расписание с колонкой "Кампус"; классы и кабинеты получают префикс кампуса, а педагоги —
+    нет, поэтому конфликты педагогов ищутся между кампусами.
+    """
+    specs = configured_sources()
+    cache = _source_cache()
+    meta: Dict[str, Any] = {
+        "warnings": [], "missing_columns": [], "discovered_classes": [], "layout_changes": [], "class_levels": {},
+        "raw_columns": [], "sources": [],
+    }
+
+    with ThreadPoolExecutor(max_workers=max(1, min(SOURCES_MAX_WORKERS, len(specs)))) as pool:
+        futures = [(spec, pool.submit(_load_source, spec, cache)) for spec in specs]
+
+    frames = []
+    raw_rows = 0
+    for spec, fut in futures:
+        try:
+            df, src_meta, parsed = fut.result()
+            status = "разобрана заново" if parsed else "без изменений"
+        except Exception as e:
+            cached = cache.get(spec.campus)
+            if cached is None:
+                meta["warnings"].append(f"{spec.campus}: ошибка загрузки — {e}")
+                meta["sources"].append({"Кампус": spec.campus, "Статус": "ошибка", "Строк": 0})
+                continue
+            # Кампус не выпадает из сводного расписания (и из конфликтов между кампусами):
+            # берем последнюю удачно разобранную версию
+            meta["warnings"].append(f"{spec.campus}: ошибка загрузки, показана прошлая версия — {e}")
+            _, df, src_meta = cached
+            status = "устарело"
+
+        meta["sources"].append({"Кампус": spec.campus, "Статус": status, "Строк": int(len(df))})
+        meta["warnings"] += [f"{spec.campus}: {w}" for w in src_meta["warnings"]]
+        meta["missing_columns"] += [f"{spec.campus}: {c}" for c in src_meta["missing_columns"]]
+        meta["discovered_classes"] += [qualify(spec.campus, c) for c in src_meta.get("discovered_classes", [])]
+        meta["class_levels"].update({
+            qualify(spec.campus, c): (spec.campus, level) for c, (_, level) in src_meta["class_levels"].items()
+        })
+        # сравнение с прошлой сборкой — здесь, а не в кэшируемой meta источника
+        changes = layout_changes(spec.campus, src_meta["layout"])
+        if changes:
+            meta["layout_changes"] += [f"{spec.campus}: {c}" for c in changes]
+            meta["warnings"].append(f"{spec.campus}: {_layout_warning(changes)}")
+        meta["raw_columns"] += [c for c in src_meta["raw_columns"] if c not in meta["raw_columns"]]
+        raw_rows += src_meta["raw_shape"][0]
+
+        if df.empty:
+            continue
+        df = df.copy()
+        df.insert(0, "Кампус", spec.campus)
+        df["Класс"] = [qualify(spec.campus, c) for c in df["Класс"]]
+        df["Комната"] = [qualify(spec.campus, r) for r in df["Комната"]]
+        frames.append(df)
+
+    if not frames:
+        if len(meta["sources"]) and all(s["Статус"] == "ошибка" for s in meta["sources"]):
+            raise RuntimeError("; ".join(meta["warnings"]))
+        result_df = pd.DataFrame()
+    else:
+        result_df = _sort_schedule(pd.concat(frames, ignore_index=True))
+
+    meta["raw_shape"] = (raw_rows, len(meta["raw_columns"]))
+    meta["processed_shape"] = result_df.shape
+    meta["fingerprint"] = snapshot_fingerprint(result_df)
+    meta["last_loaded_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return result_df, meta
+
+
+@st.cache_data(ttl=REFRESH_EVERY_SECONDS)
+def _load_sources_by_ttl() -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    return process_sources()
+
+
+@st.cache_data(max_entries=2)
+def _load_sources_by_version(versions: Tuple[int, ...], ttl_slot: int) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    # versions — счетчики изменений локальных файлов; ttl_slot — номер интервала
+    # REFRESH_EVERY_SECONDS, если среди источников есть ссылки (иначе всегда 0)
+    df, meta = process_sources()
+    meta["source_version"] = sum(versions)
+    return df, meta
+
+
+@st.cache_data(ttl=REFRESH_EVERY_SECONDS)
+def _load_by_ttl() -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    return process_raw_table()
+
+
+@st.cache_data(max_entries=2)
+def _load_by_version(version: int) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    # version — счетчик изменений файла (watch.FileWatcher): новый номер = одна перезагрузка
+    df, meta = process_raw_table()
+    meta["source_version"] = version
+    return df, meta
+
+
+def local_source_watchers() -> List[FileWatcher]:
+    """Наблюдатели за локальными xlsx-источниками (пусто, если LOCAL_WATCH выключен или файлов нет)."""
+    if not LOCAL_WATCH:
+        return []
+    return [get_watcher(spec.location) for spec in configured_sources() if spec.mode == "excel_local"]
+
+
+def load_and_process_data() -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    Обработанное расписание + meta.
+    Если заданы SOURCES — сводное расписание всех кампусов (см. process_sources).
+    Локальные файлы при LOCAL_WATCH перечитываются только после их реального изменения
+    (между изменениями — попадание в кэш без обращения к диску), ссылки — раз в REFRESH_EVERY_SECONDS.
+    """
+    watchers = local_source_watchers()
+    versions = tuple(w.version for w in watchers)
+    if SOURCES:
+        if not watchers:
+            return _load_sources_by_ttl()
+        has_remote = any(spec.mode != "excel_local" for spec in configured_sources())
+        ttl_slot = int(_time.time() // REFRESH_EVERY_SECONDS) if has_remote else 0
+        return _load_sources_by_version(versions, ttl_slot)
+    if watchers:
+        return _load_by_version(versions[0])
+    return _load_by_ttl()
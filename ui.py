@@ -1,10 +1,19 @@
 # ui.py
-from datetime import time
-from typing import Tuple, Dict, Any
+from datetime import date, datetime, time, timedelta
+from typing import Tuple, Dict, Any, Optional, List
+from zoneinfo import ZoneInfo
 
 import pandas as pd
 import streamlit as st
 
+from settings import TIMEZONE, WEEKDAY_MAP
+from intervals import IntervalIndex
+from availability import AvailabilityMatrix
+from source import has_overlay_source
+from overlay import week_start_of
+from history import SnapshotHistory, get_diff
+from watch import FileWatcher
+
 
 def _selectbox_sidebar(label: str, options: list[str], key: str) -> str:
     cur = st.session_state.get(key, options[0])
@@ -21,7 +30,7 @@ def render_tab_selector_and_refresh() -> str:
     очистить cache_data, а дальше код ниже по файлу (app.py) сам загрузит свежие данные
     и применит фильтры в этом же прогоне.
     """
-    tabs = ["📅 Расписание", "⚠️ Конфликты"]
+    tabs = ["📅 Расписание", "🕒 Сейчас", "🆓 Свободные", "⚠️ Конфликты", "🕘 История"]
 
     if "active_tab" not in st.session_state:
         st.session_state["active_tab"] = tabs[0]
@@ -48,12 +57,49 @@ def render_tab_selector_and_refresh() -> str:
     return active_tab
 
 
+@st.fragment(run_every="2s")
+def render_local_watch(watchers: List[FileWatcher]) -> None:
+    """
+    Локальные xlsx: как только наблюдатель зафиксировал сохранение файла,
+    перезапускаем страницу — load_and_process_data() перечитает данные один раз.
+    Сама проверка — чтение счетчиков в памяти, без обращения к диску.
+    """
+    versions = tuple(w.version for w in watchers)
+    seen = st.session_state.setdefault("source_version", versions)
+    if versions != seen:
+        st.session_state["source_version"] = versions
+        st.rerun(scope="app")
+
+
+def render_overlay_week_selector() -> date:
+    """
+    Неделя, замены которой накладываются на расписание (по умолчанию — текущая).
+    Если источник замен не настроен, выбор не показываем.
+    """
+    today = datetime.now(ZoneInfo(TIMEZONE)).date()
+    if not has_overlay_source():
+        return week_start_of(today)
+
+    picked = st.sidebar.date_input("Неделя (с учетом замен):", value=today, key="overlay_date", format="DD.MM.YYYY")
+    week_start = week_start_of(picked)
+    st.sidebar.caption(f"Замены на {week_start:%d.%m}–{week_start + timedelta(days=4):%d.%m}")
+    return week_start
+
+
 # =========================
 # ФИЛЬТРЫ РАСПИСАНИЯ (sidebar)
 # =========================
 def render_filters(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
     st.sidebar.header("🔍 Фильтры")
 
+    # Кампус (только если расписание собрано из нескольких таблиц)
+    selected_campus = "Все"
+    if "Кампус" in df.columns:
+        campuses = ["Все"] + sorted(
+            [str(c).strip() for c in df["Кампус"].dropna().unique().tolist() if str(c).strip() != ""]
+        )
+        selected_campus = _selectbox_sidebar("Кампус:", campuses, key="f_campus")
+
     # День недели
     weekdays = ["Все"] + sorted(
         [str(d).strip() for d in df["День недели"].dropna().unique().tolist() if str(d).strip() != ""]
@@ -100,6 +146,9 @@ def render_filters(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
     # Применение фильтров
     filtered_df = df.copy()
 
+    if selected_campus != "Все":
+        filtered_df = filtered_df[filtered_df["Кампус"].astype(str).str.strip() == selected_campus]
+
     if selected_weekday != "Все":
         filtered_df = filtered_df[filtered_df["День недели"].astype(str).str.strip() == selected_weekday]
 
@@ -121,6 +170,7 @@ def render_filters(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
         filtered_df = filtered_df[filtered_df["Комната"].astype(str).str.strip() == selected_room]
 
     selected = {
+        "campus": selected_campus,
         "weekday": selected_weekday,
         "class": selected_class,
         "teacher": selected_teacher,
@@ -180,10 +230,14 @@ def render_table(filtered_df: pd.DataFrame) -> None:
         st.info("Нет данных, соответствующих выбранным фильтрам")
         return
 
-    display_df = filtered_df[
-        ["День недели", "Номер урока", "Начало", "Конец", "Класс", "Группа",
-         "Предмет", "Педагог", "Тьютор", "Комната"]
-    ].copy()
+    columns = ["День недели", "Номер урока", "Начало", "Конец", "Класс", "Группа",
+               "Предмет", "Педагог", "Тьютор", "Комната"]
+    if "Кампус" in filtered_df.columns:
+        columns.insert(0, "Кампус")
+    # колонка появляется, только если на неделю есть замены
+    if "Изменение" in filtered_df.columns:
+        columns.append("Изменение")
+    display_df = filtered_df[columns].copy()
 
     display_df["Начало"] = display_df["Начало"].apply(lambda x: x.strftime("%H:%M") if isinstance(x, time) else "")
     display_df["Конец"] = display_df["Конец"].apply(lambda x: x.strftime("%H:%M") if isinstance(x, time) else "")
@@ -197,6 +251,11 @@ def render_diagnostics(meta: Dict[str, Any]) -> None:
         st.write("Последняя загрузка:", meta.get("last_loaded_at"))
         st.write("Размер сырой таблицы:", meta.get("raw_shape"))
         st.write("Размер обработанной таблицы:", meta.get("processed_shape"))
+        if meta.get("sources"):
+            st.write("Источники (кампусы):")
+            st.dataframe(pd.DataFrame(meta["sources"]), use_container_width=True, hide_index=True)
+        if "source_version" in meta:
+            st.write("Изменений файла с запуска:", meta["source_version"])
 
         if meta.get("warnings"):
             st.warning("\n".join(meta["warnings"]))
@@ -206,9 +265,36 @@ def render_diagnostics(meta: Dict[str, Any]) -> None:
             st.write("Отсутствующие ожидаемые колонки (проверь названия в Google Sheet):")
             st.code("\n".join(missing_cols))
 
+        if meta.get("discovered_classes"):
+            st.write("Классы, найденные по заголовку таблицы (их нет в CLASS_CONFIGS):")
+            st.code(", ".join(meta["discovered_classes"]))
+        if meta.get("layout_changes"):
+            st.write("Изменения раскладки колонок с прошлой загрузки:")
+            st.code("\n".join(meta["layout_changes"]))
+
         st.write("Колонки, которые реально есть в источнике:")
         st.code(", ".join(meta.get("raw_columns", [])))
 
+        name_dups = meta.get("name_duplicates")
+        if name_dups is not None and not name_dups.empty:
+            st.write("Похожие имена (возможно, один и тот же человек/кабинет записан по-разному):")
+            st.dataframe(name_dups, use_container_width=True, hide_index=True)
+            st.caption(
+                "«Склеено» — считаются ли имена одним человеком/кабинетом при поиске конфликтов. "
+                "Неоднозначные варианты (\"Иванова\" при \"Иванова А.\" и \"Иванова Б.\") не склеиваются — "
+                "задайте их в NAME_ALIASES (settings.py)."
+            )
+
+        overlay_meta = meta.get("overlay") or {}
+        if overlay_meta.get("changes_total") or overlay_meta.get("warnings"):
+            st.write("Замены: всего строк", overlay_meta.get("changes_total", 0),
+                     "— применено на выбранную неделю:", overlay_meta.get("applied", 0))
+            if overlay_meta.get("unmatched"):
+                st.write("Строки замен, не подошедшие ни к одному уроку:")
+                st.code(", ".join(str(n) for n in overlay_meta["unmatched"]))
+            if overlay_meta.get("warnings"):
+                st.warning("\n".join(overlay_meta["warnings"]))
+
 
 def render_footer() -> None:
     st.markdown("---")
@@ -221,6 +307,7 @@ def render_footer() -> None:
   - `A: ...`
   - `B: ...`
 - Если, например, **Комната** указана одной строкой без `A:`/`B:`, она будет применена к обеим группам автоматически.
+- Замены/отмены на конкретные даты ведутся отдельным CSV (см. `OVERLAY_CSV_PATH` / `OVERLAY_CSV_URL` в settings.py); неделя выбирается в боковой панели.
 """
     )
 
@@ -249,3 +336,214 @@ def render_conflicts_tab(conflicts_df: pd.DataFrame, conflicts_meta: Dict[str, A
         st.write("Пропущено (нет дня):", conflicts_meta.get("skipped_no_day", 0))
         st.write("Пропущено (нет педагога/тьютора):", conflicts_meta.get("skipped_no_person", 0))
         st.write("Пропущено (нет кабинета):", conflicts_meta.get("skipped_no_room", 0))
+
+
+# =========================
+# ВКЛАДКА «СЕЙЧАС»
+# =========================
+NOW_SECTIONS = [
+    ("teacher", "👩‍🏫 Педагоги"),
+    ("tutor", "🧑‍🤝‍🧑 Тьюторы"),
+    ("room", "🚪 Кабинеты"),
+    ("class", "🎒 Классы"),
+]
+
+
+def _lesson_short(lesson: Optional[Dict[str, Any]], kind: str) -> str:
+    if not lesson:
+        return ""
+    grp = lesson.get("Группа", "")
+    grp_part = f" [{grp}]" if grp else ""
+    parts = [f"{lesson.get('Предмет', '')}{grp_part}"]
+    if kind != "class":
+        parts.append(lesson.get("Класс", ""))
+    if kind != "room" and lesson.get("Комната"):
+        parts.append(f"каб. {lesson['Комната']}")
+    if kind in ("room", "class") and lesson.get("Педагог"):
+        parts.append(lesson["Педагог"])
+    return ", ".join(p for p in parts if p)
+
+
+def _now_rows(index: IntervalIndex, kind: str, day: str, t: time) -> List[Dict[str, str]]:
+    rows = []
+    for label in index.resources(kind):
+        current = index.at(kind, label, day, t)
+        nxt = index.next_after(kind, label, day, t)
+        rows.append({
+            "Ресурс": label,
+            "Сейчас": "; ".join(_lesson_short(les, kind) for les in current),
+            "До": max(les["Конец"] for les in current).strftime("%H:%M") if current else "",
+            "Далее": _lesson_short(nxt, kind),
+            "Начало": nxt["Начало"].strftime("%H:%M") if nxt else "",
+        })
+    return rows
+
+
+@st.fragment(run_every="60s")
+def render_now_tab(index: IntervalIndex) -> None:
+    """
+    Текущий и следующий урок по каждому педагогу/тьютору/кабинету/классу.
+    Фрагмент перерисовывается раз в минуту сам по себе: берет данные из готового
+    IntervalIndex и не трогает DataFrame.
+    """
+    st.subheader("🕒 Сейчас")
+
+    days = list(WEEKDAY_MAP.values())
+    now = datetime.now(ZoneInfo(TIMEZONE))
+
+    manual = st.toggle("Выбрать день и время вручную", key="now_manual")
+    if manual:
+        col_day, col_time = st.columns(2)
+        with col_day:
+            default_day = days[now.weekday()] if now.weekday() < len(days) else days[0]
+            day = st.selectbox("День недели:", days, index=days.index(default_day), key="now_day")
+        with col_time:
+            t = st.time_input("Время:", value=now.time().replace(second=0, microsecond=0), key="now_time", step=300)
+    else:
+        if now.weekday() >= len(days):
+            st.info("Сегодня выходной — уроков нет.")
+            return
+        day = days[now.weekday()]
+        t = now.time()
+
+    st.caption(f"{day}, {t.strftime('%H:%M')}")
+
+    q = st.text_input("Поиск (педагог/кабинет/класс):", key="now_q")
+    q_norm = str(q).strip().casefold()
+
+    for kind, title in NOW_SECTIONS:
+        rows = _now_rows(index, kind, day, t)
+        if q_norm != "":
+            rows = [r for r in rows if q_norm in r["Ресурс"].casefold()]
+        # показываем только тех, у кого сегодня еще что-то есть
+        rows = [r for r in rows if r["Сейчас"] or r["Далее"]]
+        with st.expander(f"{title} ({len(rows)})", expanded=(kind == "teacher")):
+            if not rows:
+                st.info("Нет текущих и предстоящих уроков")
+            else:
+                st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+
+# =========================
+# ВКЛАДКА «СВОБОДНЫЕ» (поиск замены)
+# =========================
+def render_free_tab(matrix: AvailabilityMatrix) -> None:
+    """
+    Поиск свободных педагогов и кабинетов на выбранное окно.
+    Работает по готовой матрице занятости, расписание заново не фильтрует.
+    """
+    st.subheader("🆓 Свободные педагоги и кабинеты")
+
+    days = list(WEEKDAY_MAP.values())
+    col_day, col_slot = st.columns(2)
+    with col_day:
+        day = st.selectbox("День недели:", days, key="free_day")
+
+    custom = "Своё время"
+    slot_labels = {
+        f"{int(num) if pd.notna(num) else '—'} урок, {s.strftime('%H:%M')}–{e.strftime('%H:%M')}": (s, e)
+        for num, s, e in matrix.slots.get(day, [])
+    }
+    with col_slot:
+        slot = st.selectbox("Урок:", list(slot_labels.keys()) + [custom], key="free_slot")
+
+    if slot == custom:
+        col_start, col_end = st.columns(2)
+        with col_start:
+            start = st.time_input("Начало:", value=time(10, 40), key="free_start", step=300)
+        with col_end:
+            end = st.time_input("Конец:", value=time(11, 25), key="free_end", step=300)
+    else:
+        start, end = slot_labels[slot]
+
+    if end <= start:
+        st.warning("Конец окна должен быть позже начала")
+        return
+
+    subjects = st.multiselect("Предмет педагога:", matrix.all_subjects(), key="free_subjects")
+
+    free_people = matrix.free("person", day, start, end, subjects=subjects or None)
+    free_rooms = matrix.free("room", day, start, end)
+
+    st.caption(f"{day}, {start.strftime('%H:%M')}–{end.strftime('%H:%M')}")
+    col_people, col_rooms = st.columns(2)
+    with col_people:
+        st.metric("Свободно педагогов/тьюторов", len(free_people))
+        st.dataframe(pd.DataFrame({"Педагог/тьютор": free_people}), use_container_width=True, hide_index=True)
+    with col_rooms:
+        st.metric("Свободно кабинетов", len(free_rooms))
+        st.dataframe(pd.DataFrame({"Кабинет": free_rooms}), use_container_width=True, hide_index=True)
+
+
+# =========================
+# ВКЛАДКА «ИСТОРИЯ» (что изменилось)
+# =========================
+def render_history_tab(history: SnapshotHistory) -> None:
+    st.subheader("🕘 История изменений расписания")
+
+    versions = history.versions()
+    if len(versions) < 2:
+        st.info("Сохранена только одна версия расписания — сравнивать пока не с чем.")
+        return
+
+    labels = {f"#{v['id']} — {v['saved_at']} ({v['rows']} строк)": v["id"] for v in reversed(versions)}
+    names = list(labels.keys())
+
+    col_new, col_old = st.columns(2)
+    with col_new:
+        new_name = st.selectbox("Версия:", names, index=0, key="hist_new")
+    with col_old:
+        old_name = st.selectbox("Сравнить с:", names, index=1, key="hist_old")
+
+    new_id, old_id = labels[new_name], labels[old_name]
+    if new_id == old_id:
+        st.info("Выберите две разные версии")
+        return
+    if old_id > new_id:
+        old_id, new_id = new_id, old_id
+
+    diff_df = get_diff(old_id, new_id)
+
+    # фильтры (sidebar)
+    st.sidebar.header("🔍 Фильтры изменений")
+    classes = ["Все"] + sorted(set(diff_df["Класс"].tolist()))
+    f_class = _selectbox_sidebar("Класс:", classes, key="hist_class")
+    people = ["Все"] + sorted({p for ps in diff_df["__people"] for p in ps}, key=str.casefold)
+    f_person = _selectbox_sidebar("Педагог или тьютор:", people, key="hist_person")
+    rooms = ["Все"] + sorted({r for rs in diff_df["__rooms"] for r in rs}, key=str.casefold)
+    f_room = _selectbox_sidebar("Кабинет:", rooms, key="hist_room")
+
+    view = diff_df
+    if f_class != "Все":
+        view = view[view["Класс"] == f_class]
+    if f_person != "Все":
+        view = view[view["__people"].map(lambda ps: f_person in ps)]
+    if f_room != "Все":
+        view = view[view["__rooms"].map(lambda rs: f_room in rs)]
+
+    counts = view["Изменение"].value_counts()
+    cols = st.columns(4)
+    for col, kind in zip(cols, ["изменено", "перенесено", "добавлено", "удалено"]):
+        col.metric(kind.capitalize(), int(counts.get(kind, 0)))
+
+    if view.empty:
+        st.success("Изменений нет ✅")
+    else:
+        st.dataframe(
+            view[["Изменение", "Класс", "Группа", "Было", "Стало"]],
+            use_container_width=True,
+            hide_index=True,
+            height=550,
+        )
+
+    # откат: выгрузка старой версии целиком, чтобы вернуть значения в таблицу
+    old_df = history.load(old_id)
+    for col in ("Начало", "Конец"):
+        old_df[col] = old_df[col].apply(lambda x: x.strftime("%H:%M") if isinstance(x, time) else "")
+    st.download_button(
+        f"⬇️ Скачать версию #{old_id} (CSV)",
+        data=old_df.to_csv(index=False).encode("utf-8-sig"),
+        file_name=f"schedule_v{old_id}.csv",
+        mime="text/csv",
+        key="hist_download",
+    )
@@ -1,5 +1,5 @@
 # utils.py
-from datetime import datetime, time
+from datetime import date, datetime, time
 from typing import Any, Optional, List
 
 import pandas as pd
@@ -53,6 +53,36 @@ def to_time(val: Any) -> Optional[time]:
     return None
 
 
+def to_date(val: Any) -> Optional[date]:
+    """
+    Приводит значение к datetime.date.
+    Поддерживает:
+    - datetime / pandas Timestamp / date
+    - строки '19.10.2026' / '19.10.26' / '2026-10-19'
+    """
+    if val is None or (isinstance(val, float) and pd.isna(val)) or (isinstance(val, str) and val.strip() == ""):
+        return None
+
+    if hasattr(val, "to_pydatetime"):
+        val = val.to_pydatetime()
+
+    if isinstance(val, datetime):
+        return val.date()
+
+    if isinstance(val, date):
+        return val
+
+    if isinstance(val, str):
+        s = val.strip()
+        for fmt in ("%d.%m.%Y", "%d.%m.%y", "%Y-%m-%d"):
+            try:
+                return datetime.strptime(s, fmt).date()
+            except ValueError:
+                pass
+
+    return None
+
+
 def safe_str(val: Any) -> str:
     if val is None or (isinstance(val, float) and pd.isna(val)):
         return ""
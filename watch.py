@@ -0,0 +1,109 @@
+# watch.py
+from __future__ import annotations
+
+import os
+import threading
+import time as _time
+from typing import Optional, Tuple
+
+import streamlit as st
+
+from settings import LOCAL_WATCH_DEBOUNCE_SECONDS, LOCAL_WATCH_POLL_SECONDS
+
+try:
+    # watchdog приходит вместе со streamlit (кроме macOS); внутри — inotify / ReadDirectoryChangesW
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:  # без watchdog просто опрашиваем stat
+    FileSystemEventHandler = object
+    Observer = None
+
+
+Signature = Optional[Tuple[int, int, int]]
+
+
+def file_signature(path: str) -> Signature:
+    """(mtime_ns, размер, inode) — меняется при любом сохранении, в т.ч. через временный файл + rename."""
+    try:
+        st_ = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st_.st_mtime_ns, st_.st_size, st_.st_ino
+
+
+class _Handler(FileSystemEventHandler):
+    def __init__(self, watcher: "FileWatcher") -> None:
+        super().__init__()
+        self._watcher = watcher
+
+    def on_any_event(self, event) -> None:
+        # Следим за каталогом (Excel сохраняет через временный файл), поэтому фильтруем по имени
+        for p in (getattr(event, "src_path", ""), getattr(event, "dest_path", "")):
+            if p and os.path.basename(os.fsdecode(p)) == self._watcher.name:
+                self._watcher.poke()
+                return
+
+
+class FileWatcher:
+    """
+    Следит за одним файлом. version увеличивается ровно на 1 после каждого реального изменения:
+    событие (или опрос) -> ждем, пока подпись файла перестанет меняться debounce секунд,
+    и только если итоговая подпись отличается от прошлой — считаем это изменением.
+    Читать version можно сколько угодно часто: это просто поле в памяти.
+    """
+
+    def __init__(self, path: str, debounce: float, poll: float) -> None:
+        self.path = os.path.abspath(path)
+        self.name = os.path.basename(self.path)
+        self.debounce = debounce
+        self.poll = poll
+        self.version = 0
+        self.mode = "polling"
+        self._signature = file_signature(self.path)
+        self._dirty = threading.Event()
+        self._observer = None
+
+    def poke(self) -> None:
+        self._dirty.set()
+
+    def start(self) -> "FileWatcher":
+        folder = os.path.dirname(self.path)
+        if Observer is not None and os.path.isdir(folder):
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_Handler(self), folder, recursive=False)
+                self._observer.daemon = True
+                self._observer.start()
+                self.mode = "events"
+            except OSError:
+                self._observer = None
+        threading.Thread(target=self._run, name="xlsx-watch", daemon=True).start()
+        return self
+
+    def _wait_stable(self) -> Signature:
+        sig = file_signature(self.path)
+        while True:
+            _time.sleep(self.debounce)
+            new_sig = file_signature(self.path)
+            if new_sig == sig:
+                return sig
+            sig = new_sig
+
+    def _run(self) -> None:
+        while True:
+            # В режиме событий ждем сигнала; опрос — подстраховка (и единственный способ без watchdog)
+            timeout = self.poll if self.mode == "polling" else max(self.poll, 30.0)
+            self._dirty.wait(timeout)
+            self._dirty.clear()
+            if file_signature(self.path) == self._signature:
+                continue
+            sig = self._wait_stable()
+            if sig != self._signature:
+                self._signature = sig
+                self.version += 1
+
+
+@st.cache_resource
+def get_watcher(path: str) -> FileWatcher:
+    # один наблюдатель на файл на процесс
+    return FileWatcher(path, LOCAL_WATCH_DEBOUNCE_SECONDS, LOCAL_WATCH_POLL_SECONDS).start()